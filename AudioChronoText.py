@@ -1,526 +1,4525 @@
-import os
-import json
-import difflib
-import time
-import re
-import tkinter as tk
-from tkinter import ttk, filedialog, scrolledtext
-from tkinter import messagebox
-import threading
-import tkinter.font as tkFont
-from faster_whisper import WhisperModel
-from pydub import AudioSegment
-
-def clean_word(word):
-    cleaned = re.sub(r'[^\w\s]', '', word)
-    return cleaned.strip()
-
-class AudioTranscriber:
-    def __init__(self, model_name="large-v2", device="cpu"):
-        device = "cpu"
-        print(f"載入 Faster Whisper {model_name} 模型於 {device}...")
-        try:
-            self.model = WhisperModel(model_name, device=device)
-            print("模型載入成功")
-        except Exception as e:
-            print(f"模型載入出錯: {e}")
-            raise
-        
-    def transcribe_audio(self, audio_path, reference_text=None):
-        if not os.path.isfile(audio_path):
-            return {"error": f"找不到文件: {audio_path}"}
-        print("使用 Faster Whisper 進行轉錄...")
-        segments, info = self.model.transcribe(audio_path, word_timestamps=True)
-        
-        transcription = ""
-        word_timestamps = []
-        
-        for segment in segments:
-            transcription += segment.text + " "
-            for word in segment.words:
-                original_word = word.word.strip()
-                cleaned_word = clean_word(original_word)
-                
-                if cleaned_word:
-                    word_timestamps.append({
-                        "word": cleaned_word,
-                        "original_word": original_word, 
-                        "start": round(word.start, 3),
-                        "end": round(word.end, 3)
-                    })
-
-        transcription = transcription.strip()
-        
-        if reference_text:
-            print("使用參考文本修正轉錄...")
-            corrected_transcription, corrected_timestamps = self.correct_transcription(
-                transcription, 
-                reference_text, 
-                word_timestamps
-            )
-            result = {
-                "original_transcription": transcription,
-                "corrected_transcription": corrected_transcription,
-                "words": corrected_timestamps
-            }
-        else:
-            result = {
-                "transcription": transcription,
-                "words": word_timestamps
-            }
-            
-        return result
-    
-    def correct_transcription(self, transcription, reference_text, word_timestamps):
-
-        trans_lower = transcription.lower()
-        ref_lower = reference_text.lower()
-
-        trans_words_raw = trans_lower.split()
-        ref_words_raw = ref_lower.split()
-        
-
-        trans_words = [clean_word(w) for w in trans_words_raw]
-        ref_words = [clean_word(w) for w in ref_words_raw]
-        
-
-        trans_words = [w for w in trans_words if w]
-        ref_words = [w for w in ref_words if w]
-        
-
-        ref_original_map = {}
-        for i, raw in enumerate(ref_words_raw):
-            cleaned = clean_word(raw)
-            if cleaned:
-                ref_original_map[i] = raw
-        
-
-        matcher = difflib.SequenceMatcher(None, trans_words, ref_words)
-        
-
-        corrected_timestamps = []
-        current_trans_idx = 0
-        
-        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
-            if tag == 'equal':
-
-                for k in range(i2 - i1):
-                    if current_trans_idx < len(word_timestamps):
-                        timestamp = {
-                            "word": word_timestamps[current_trans_idx]["word"],
-                            "start": round(word_timestamps[current_trans_idx]["start"], 3),
-                            "end": round(word_timestamps[current_trans_idx]["end"], 3)
-                        }
-
-                        orig_idx = j1 + k
-                        if orig_idx in ref_original_map:
-                            timestamp["word"] = clean_word(ref_original_map[orig_idx])
-                        
-                        corrected_timestamps.append(timestamp)
-                        current_trans_idx += 1
-            
-            elif tag == 'replace':
-
-                trans_segment_len = i2 - i1
-                ref_segment_len = j2 - j1
-                
-                if trans_segment_len > 0 and current_trans_idx < len(word_timestamps):
-
-                    start_time = word_timestamps[current_trans_idx]["start"]
-                    
-                    if current_trans_idx + trans_segment_len - 1 < len(word_timestamps):
-                        end_time = word_timestamps[current_trans_idx + trans_segment_len - 1]["end"]
-                    else:
-                        end_time = word_timestamps[-1]["end"]
-                    
-
-                    time_span = end_time - start_time
-                    word_span = time_span / ref_segment_len if ref_segment_len > 0 else 0
-                    
-                    for k in range(ref_segment_len):
-                        word_start = start_time + (k * word_span)
-                        
-
-                        orig_idx = j1 + k
-                        orig_word = ref_original_map.get(orig_idx, f"word_{j1+k}")
-                        cleaned_word = clean_word(orig_word)
-                        
-                        corrected_timestamps.append({
-                            "word": cleaned_word,
-                            "start": round(word_start, 3),
-                            "end": round(word_start + word_span, 3)
-                        })
-                    
-                    current_trans_idx += trans_segment_len
-            
-            elif tag == 'delete':
-
-                current_trans_idx += (i2 - i1)
-            
-            elif tag == 'insert':
-
-                if current_trans_idx > 0 or current_trans_idx < len(word_timestamps):
-
-                    if current_trans_idx == 0:
-
-                        next_time = word_timestamps[0]["start"]
-                        prev_time = max(0, next_time - 0.5) 
-                    elif current_trans_idx >= len(word_timestamps):
-
-                        prev_time = word_timestamps[-1]["end"]
-                        next_time = prev_time + 0.5 
-                    else:
-
-                        prev_time = word_timestamps[current_trans_idx-1]["end"]
-                        next_time = word_timestamps[current_trans_idx]["start"]
-                    
-                    gap = next_time - prev_time
-                    word_gap = gap / (j2 - j1) if j2 > j1 else 0.2  
-                    
-                    for k in range(j2 - j1):
-                        word_start = prev_time + (k * word_gap)
-                        
-                        orig_idx = j1 + k
-                        orig_word = ref_original_map.get(orig_idx, f"word_{j1+k}")
-                        cleaned_word = clean_word(orig_word)
-                        
-                        corrected_timestamps.append({
-                            "word": cleaned_word,
-                            "start": round(word_start, 3),
-                            "end": round(word_start + word_gap, 3)
-                        })
-        
-        corrected_timestamps.sort(key=lambda x: x["start"])
-        
-        corrected_transcription = " ".join([w for w in reference_text.split()])
-        
-        return corrected_transcription, corrected_timestamps
-
-def format_timestamp(seconds):
-    hours = int(seconds // 3600)
-    minutes = int((seconds % 3600) // 60)
-    seconds = seconds % 60
-    return f"{hours:02d}:{minutes:02d}:{seconds:06.3f}"
-
-class TranscriberApp:
-    def __init__(self, root):
-        self.root = root
-        self.root.title("語音轉錄工具")
-        self.root.geometry("900x700")
-        self.root.configure(bg="#f0f0f0")
-        
-        # 自定義字體
-        self.title_font = tkFont.Font(family="微軟正黑體", size=16, weight="bold")
-        self.normal_font = tkFont.Font(family="微軟正黑體", size=10)
-        self.button_font = tkFont.Font(family="微軟正黑體", size=10, weight="bold")
-        
-        # 創建主框架
-        self.main_frame = ttk.Frame(root, padding=10)
-        self.main_frame.pack(fill=tk.BOTH, expand=True)
-        
-        # 創建樣式
-        self.style = ttk.Style()
-        self.style.configure("TFrame", background="#f0f0f0")
-        self.style.configure("TLabel", background="#f0f0f0", font=self.normal_font)
-        self.style.configure("TButton", font=self.button_font)
-        self.style.configure("Title.TLabel", font=self.title_font)
-        
-        # 創建標題
-        self.title_label = ttk.Label(
-            self.main_frame, 
-            text="語音轉錄工具", 
-            style="Title.TLabel"
-        )
-        self.title_label.grid(row=0, column=0, columnspan=3, pady=10)
-        
-        # 音頻文件選擇部分
-        self.audio_frame = ttk.LabelFrame(self.main_frame, text="音頻文件選擇 (僅支援MP3格式)", padding=10)
-        self.audio_frame.grid(row=1, column=0, columnspan=3, sticky="ew", pady=5, padx=5)
-        
-        self.audio_path_var = tk.StringVar()
-        self.audio_path_entry = ttk.Entry(self.audio_frame, textvariable=self.audio_path_var, width=50)
-        self.audio_path_entry.grid(row=0, column=0, padx=5, pady=5, sticky="ew")
-        
-        self.browse_button = ttk.Button(
-            self.audio_frame, 
-            text="瀏覽...", 
-            command=self.browse_audio_file
-        )
-        self.browse_button.grid(row=0, column=1, padx=5, pady=5)
-        
-        # 參考文本框架
-        self.ref_frame = ttk.LabelFrame(
-            self.main_frame, 
-            text="參考文本 (可選) - 可直接貼上純文字或上傳TXT文件", 
-            padding=10
-        )
-        self.ref_frame.grid(row=2, column=0, columnspan=3, sticky="nsew", pady=5, padx=5)
-        self.main_frame.columnconfigure(0, weight=1)
-        self.main_frame.rowconfigure(2, weight=1)
-        
-        self.ref_text = scrolledtext.ScrolledText(
-            self.ref_frame, 
-            wrap=tk.WORD, 
-            width=80, 
-            height=6, 
-            font=self.normal_font
-        )
-        self.ref_text.grid(row=0, column=0, columnspan=2, sticky="nsew", padx=5, pady=5)
-        self.ref_frame.columnconfigure(0, weight=1)
-        self.ref_frame.rowconfigure(0, weight=1)
-
-        self.browse_ref_button = ttk.Button(
-            self.ref_frame, 
-            text="從文件導入...", 
-            command=self.browse_ref_file
-        )
-        self.browse_ref_button.grid(row=1, column=0, sticky="w", padx=5, pady=5)
-        
-        self.clear_ref_button = ttk.Button(
-            self.ref_frame, 
-            text="清除參考文本", 
-            command=self.clear_ref_text
-        )
-        self.clear_ref_button.grid(row=1, column=1, sticky="e", padx=5, pady=5)
-        
-        self.action_frame = ttk.Frame(self.main_frame, padding=5)
-        self.action_frame.grid(row=3, column=0, columnspan=3, sticky="ew", pady=5, padx=5)
-        
-        self.transcribe_button = ttk.Button(
-            self.action_frame, 
-            text="開始轉錄", 
-            command=self.start_transcription
-        )
-        self.transcribe_button.grid(row=0, column=0, padx=5, pady=5)
-        
-        self.status_var = tk.StringVar(value="準備就緒")
-        self.status_label = ttk.Label(self.action_frame, textvariable=self.status_var)
-        self.status_label.grid(row=0, column=1, padx=5, pady=5)
-        
-        self.progress_var = tk.DoubleVar()
-        self.progress_bar = ttk.Progressbar(
-            self.action_frame, 
-            orient=tk.HORIZONTAL, 
-            length=300, 
-            mode="indeterminate", 
-            variable=self.progress_var
-        )
-        self.progress_bar.grid(row=0, column=2, padx=5, pady=5, sticky="ew")
-        self.action_frame.columnconfigure(2, weight=1)
-
-        self.result_frame = ttk.LabelFrame(self.main_frame, text="轉錄結果", padding=10)
-        self.result_frame.grid(row=4, column=0, columnspan=3, sticky="nsew", pady=5, padx=5)
-        self.main_frame.rowconfigure(4, weight=2)
-        
-        self.result_text = scrolledtext.ScrolledText(
-            self.result_frame, 
-            wrap=tk.WORD, 
-            width=80, 
-            height=18, 
-            font=self.normal_font
-        )
-        self.result_text.grid(row=0, column=0, sticky="nsew", padx=5, pady=5)
-        self.result_frame.columnconfigure(0, weight=1)
-        self.result_frame.rowconfigure(0, weight=1)
-        
-        self.help_frame = ttk.LabelFrame(self.main_frame, text="使用說明", padding=5)
-        self.help_frame.grid(row=5, column=0, columnspan=3, sticky="ew", pady=5, padx=5)
-        
-        help_text = """1. 選擇 MP3 音頻文件 (僅支援MP3格式)。
-2. 可選：輸入參考文本或從文件導入。
-3. 點擊"開始轉錄"按鈕開始處理。
-4. 處理完成後，結果將顯示在下方的文本框中，並自動保存為 TXT 和 JSON 文件。
-5. 本工具使用 Whisper large-v2 模型，將在 CPU 上運行。"""
-        
-        self.help_label = ttk.Label(self.help_frame, text=help_text, justify=tk.LEFT)
-        self.help_label.grid(row=0, column=0, sticky="w", padx=5, pady=5)
-
-        self.transcriber = None
-        
-    def browse_audio_file(self):
-        filepath = filedialog.askopenfilename(
-            title="選擇音頻文件",
-            filetypes=[("MP3 文件", "*.mp3")]
-        )
-        if filepath:
-            self.audio_path_var.set(filepath)
-            
-    def browse_ref_file(self):
-        filepath = filedialog.askopenfilename(
-            title="選擇參考文本文件",
-            filetypes=[("文本文件", "*.txt")]
-        )
-        if filepath:
-            try:
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                self.ref_text.delete(1.0, tk.END)
-                self.ref_text.insert(tk.END, content)
-            except Exception as e:
-                messagebox.showerror("錯誤", f"無法讀取文件: {e}")
-                
-    def clear_ref_text(self):
-        """清除參考文本"""
-        self.ref_text.delete(1.0, tk.END)
-    
-    def start_transcription(self):
-        """開始轉錄過程"""
-        audio_path = self.audio_path_var.get().strip()
-        
-        if not audio_path:
-            messagebox.showerror("錯誤", "請選擇音頻文件")
-            return
-            
-        if not os.path.exists(audio_path):
-            messagebox.showerror("錯誤", f"找不到音頻文件: {audio_path}")
-            return
-            
-        reference_text = self.ref_text.get(1.0, tk.END).strip()
-        if not reference_text:
-            reference_text = None
-        else:
-            print(f"使用參考文本，長度: {len(reference_text)} 字符")
-
-        self.transcribe_button.configure(state="disabled")
-        self.browse_button.configure(state="disabled")
-        self.browse_ref_button.configure(state="disabled")
-
-        self.progress_bar.start(10)
-        self.status_var.set("正在準備轉錄...")
-
-        threading.Thread(target=self.run_transcription, args=(audio_path, reference_text)).start()
-        
-    def run_transcription(self, audio_path, reference_text):
-
-        try:
-
-            self.root.after(0, lambda: self.status_var.set("正在載入模型..."))
-            
-            # 創建轉錄器
-            if self.transcriber is None:
-                self.transcriber = AudioTranscriber("large-v2", "cpu")
-            
-            # 更新界面
-            self.root.after(0, lambda: self.status_var.set("正在進行轉錄..."))
-            
-            # 執行轉錄
-            start_time = time.time()
-            result = self.transcriber.transcribe_audio(audio_path, reference_text)
-            elapsed_time = time.time() - start_time
-            
-            # 處理結果
-            self.root.after(0, lambda: self.display_results(result, audio_path, elapsed_time))
-            
-        except Exception as e:
-            error_msg = f"轉錄過程中發生錯誤: {str(e)}"
-            self.root.after(0, lambda: self.show_error(error_msg))
-            
-    def display_results(self, result, audio_path, elapsed_time):
-        """顯示轉錄結果"""
-        # 停止進度條
-        self.progress_bar.stop()
-        
-        # 更新狀態
-        self.status_var.set(f"轉錄完成，用時 {elapsed_time:.2f} 秒")
-        
-        # 顯示結果
-        self.result_text.delete(1.0, tk.END)
-        
-        if "error" in result:
-            self.result_text.insert(tk.END, f"錯誤: {result['error']}\n")
-        else:
-            if "corrected_transcription" in result:
-                self.result_text.insert(tk.END, "== 修正後的轉錄 ==\n\n")
-                self.result_text.insert(tk.END, result["corrected_transcription"])
-                self.result_text.insert(tk.END, "\n\n== 原始轉錄 ==\n\n")
-                self.result_text.insert(tk.END, result["original_transcription"])
-                
-                # 保存結果
-                output_file = f"{os.path.splitext(audio_path)[0]}_transcription.txt"
-                with open(output_file, 'w', encoding='utf-8') as f:
-                    f.write("== 修正後的轉錄 ==\n\n")
-                    f.write(result["corrected_transcription"])
-                    f.write("\n\n== 單字時間戳 (已移除非文字字符) ==\n\n")
-                    for item in result["words"]:
-                        f.write(f"{format_timestamp(item['start'])} --> {format_timestamp(item['end'])}: {item['word']}")
-                        f.write("\n")
-                
-                # 保存為新的 JSON 格式
-                json_file = f"{os.path.splitext(audio_path)[0]}_transcription.json"
-                json_data = {
-                    "words": [
-                        {
-                            "word": item["word"],
-                            "start": item["start"],
-                            "end": item["end"]
-                        } for item in result["words"]
-                    ]
-                }
-                with open(json_file, 'w', encoding='utf-8') as f:
-                    json.dump(json_data, f, indent=2)
-                    
-                # 顯示保存信息
-                self.result_text.insert(tk.END, f"\n\n結果已保存至:\n{output_file}\n{json_file}")
-                
-            else:
-                self.result_text.insert(tk.END, "== 轉錄 ==\n\n")
-                self.result_text.insert(tk.END, result["transcription"])
-                
-                # 保存結果
-                output_file = f"{os.path.splitext(audio_path)[0]}_transcription.txt"
-                with open(output_file, 'w', encoding='utf-8') as f:
-                    f.write("== 轉錄 ==\n\n")
-                    f.write(result["transcription"])
-                    f.write("\n\n== 單字時間戳 (已移除非文字字符) ==\n\n")
-                    for item in result["words"]:
-                        f.write(f"{format_timestamp(item['start'])} --> {format_timestamp(item['end'])}: {item['word']}")
-                        f.write("\n")
-                
-                # 保存為新的 JSON 格式
-                json_file = f"{os.path.splitext(audio_path)[0]}_transcription.json"
-                json_data = {
-                    "words": [
-                        {
-                            "word": item["word"],
-                            "start": item["start"],
-                            "end": item["end"]
-                        } for item in result["words"]
-                    ]
-                }
-                with open(json_file, 'w', encoding='utf-8') as f:
-                    json.dump(json_data, f, indent=2)
-                    
-                # 顯示保存信息
-                self.result_text.insert(tk.END, f"\n\n結果已保存至:\n{output_file}\n{json_file}")
-        
-        # 重新啟用按鈕
-        self.transcribe_button.configure(state="normal")
-        self.browse_button.configure(state="normal")
-        self.browse_ref_button.configure(state="normal")
-        
-    def show_error(self, error_msg):
-        """顯示錯誤信息"""
-        # 停止進度條
-        self.progress_bar.stop()
-        
-        # 更新狀態
-        self.status_var.set("發生錯誤")
-        
-        # 顯示錯誤信息
-        self.result_text.delete(1.0, tk.END)
-        self.result_text.insert(tk.END, error_msg)
-        self.result_text.insert(tk.END, "\n\n請確保已安裝所有必要的 Python 包:\n")
-        self.result_text.insert(tk.END, "pip install faster-whisper pydub numpy tkinter")
-        
-        # 重新啟用按鈕
-        self.transcribe_button.configure(state="normal")
-        self.browse_button.configure(state="normal")
-        self.browse_ref_button.configure(state="normal")
-
-def main():
-    root = tk.Tk()
-    app = TranscriberApp(root)
-    root.mainloop()
-
-if __name__ == "__main__":
-    main()
+import os
+import sys
+import json
+import glob
+import difflib
+import time
+import re
+import bisect
+import random
+import argparse
+import tempfile
+import hashlib
+import queue
+import uuid
+import base64
+import shutil
+import struct
+import gzip
+import contextlib
+import cProfile
+import importlib.util
+import functools
+import itertools
+import platform
+import weakref
+from collections import OrderedDict, deque
+from types import SimpleNamespace
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+import tkinter as tk
+from tkinter import ttk, filedialog, scrolledtext
+from tkinter import messagebox
+import threading
+import tkinter.font as tkFont
+import numpy as np
+from faster_whisper import WhisperModel, BatchedInferencePipeline, decode_audio
+from faster_whisper.vad import get_speech_timestamps
+from pydub import AudioSegment
+from pydub.silence import detect_silence
+
+_PUNCTUATION = re.compile(r'[^\w\s]')
+# 轉錄與參考文本中的單字大量重複，清理結果以有上限的快取保存
+CLEAN_CACHE_SIZE = 1 << 16
+
+@functools.lru_cache(maxsize=CLEAN_CACHE_SIZE)
+def clean_word(word):
+    cleaned = _PUNCTUATION.sub('', word)
+    return cleaned.strip()
+
+# 中文與日文不以空格分詞：漢字與假名逐字作為一個單字，緊跟的標點保留在該字的原始形式中
+CJK_LANGUAGES = ("zh", "ja", "yue")
+_CJK_RANGES = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff"
+_CJK_CHAR = re.compile(f"[{_CJK_RANGES}]")
+_CJK_TOKEN = re.compile(f"[{_CJK_RANGES}][^\\w\\s]*|[^\\s{_CJK_RANGES}]+")
+
+def uses_cjk(text, language=None):
+    """是否按中日文規則分詞；language 為 None 時按文本中是否有漢字或假名判斷"""
+    if language:
+        return language.split("-")[0].lower() in CJK_LANGUAGES
+    return _CJK_CHAR.search(text) is not None
+
+def tokenize(text, language=None):
+    """把文本切分為 (原始單字, 清理後的小寫單字) 兩個平行列表，清理後為空的單字 (純標點) 不包含在內"""
+    tokens = _CJK_TOKEN.findall(text) if uses_cjk(text, language) else text.split()
+    raw, cleaned = [], []
+    for token in tokens:
+        word = clean_word(token)
+        if word:
+            raw.append(token)
+            cleaned.append(word.lower())
+    return raw, cleaned
+
+_NON_SPACE = re.compile(r"\S+")
+
+def _token_spans(text, cjk, offset=0):
+    """與 tokenize 相同的切分，另外返回每個保留單字在文本中的起止位置 (加上 offset)"""
+    raw, cleaned, starts, ends = [], [], [], []
+    for match in (_CJK_TOKEN if cjk else _NON_SPACE).finditer(text):
+        token = match.group()
+        word = clean_word(token)
+        if word:
+            raw.append(token)
+            cleaned.append(word.lower())
+            starts.append(match.start() + offset)
+            ends.append(match.end() + offset)
+    return raw, cleaned, starts, ends
+
+def timeline_tokens(timeline, cjk=False):
+    """取出時間軸上已清理的單字 (小寫) 作為對齊單元，返回 (單字列表, 開始時間, 結束時間)。
+
+    cjk 為 True 時把含漢字或假名的單字拆為與 tokenize 相同的單元，原單字的時間按字元數分給各單元。
+    """
+    words = [w.lower() for w in timeline.words()]
+    if not cjk:
+        return words, timeline.starts, timeline.ends
+    tokens, owners = [], []
+    for index, word in enumerate(words):
+        parts = _CJK_TOKEN.findall(word) if _CJK_CHAR.search(word) else (word,)
+        for part in parts:
+            tokens.append(part)
+            owners.append(index)
+    if len(tokens) == len(words):
+        return words, timeline.starts, timeline.ends
+    
+    owners = np.array(owners, dtype=np.int64)
+    lengths = np.fromiter(map(len, tokens), dtype=np.float64, count=len(tokens))
+    cumulative = np.cumsum(lengths)
+    before = cumulative - lengths
+    first = np.searchsorted(owners, owners, side="left")
+    totals = np.bincount(owners, lengths)[owners]
+    fraction_start = (before - before[first]) / totals
+    fraction_end = fraction_start + lengths / totals
+    starts = timeline.starts[owners]
+    durations = timeline.ends[owners] - starts
+    return tokens, starts + fraction_start * durations, starts + fraction_end * durations
+
+# 對齊引擎參數：小於此單元數的區間直接做動態規劃，更大的區間先以唯一 n-gram 錨點切分
+ALIGN_DP_CELLS = 40000
+ALIGN_ANCHOR_SIZES = (4, 2, 1)
+
+def align_words(a, b):
+    """對齊兩個單字列表，返回與 difflib.SequenceMatcher.get_opcodes() 相同格式的操作碼。
+
+    先以兩邊都唯一出現的 n-gram 作為錨點 (取最長遞增子序列保證順序)，
+    錨點之間的小區間用 Hirschberg 演算法求最長公共子序列，時間與記憶體接近線性。
+    """
+    blocks = []
+    _align_region(a, 0, len(a), b, 0, len(b), blocks)
+    return _blocks_to_opcodes(blocks, len(a), len(b))
+
+def _align_region(a, alo, ahi, b, blo, bhi, blocks):
+    # 去掉共同前綴與後綴
+    start = alo
+    while alo < ahi and blo < bhi and a[alo] == b[blo]:
+        alo += 1
+        blo += 1
+    if alo > start:
+        blocks.append((start, blo - (alo - start), alo - start))
+    suffix = 0
+    while alo < ahi - suffix and blo < bhi - suffix and a[ahi - suffix - 1] == b[bhi - suffix - 1]:
+        suffix += 1
+    ahi -= suffix
+    bhi -= suffix
+    
+    if alo < ahi and blo < bhi:
+        if (ahi - alo) * (bhi - blo) <= ALIGN_DP_CELLS:
+            _hirschberg(a, alo, ahi, b, blo, bhi, blocks)
+        else:
+            anchors = []
+            for size in ALIGN_ANCHOR_SIZES:
+                anchors = _find_anchors(a, alo, ahi, b, blo, bhi, size)
+                if anchors:
+                    break
+            if anchors:
+                i, j = alo, blo
+                for ai, bj, size in anchors:
+                    _align_region(a, i, ai, b, j, bj, blocks)
+                    blocks.append((ai, bj, size))
+                    i, j = ai + size, bj + size
+                _align_region(a, i, ahi, b, j, bhi, blocks)
+            else:
+                # 沒有任何唯一錨點時沿對角線對半切分，相當於帶狀對齊
+                amid = (alo + ahi) // 2
+                bmid = (blo + bhi) // 2
+                _align_region(a, alo, amid, b, blo, bmid, blocks)
+                _align_region(a, amid, ahi, b, bmid, bhi, blocks)
+    
+    if suffix:
+        blocks.append((ahi, bhi, suffix))
+
+def _find_anchors(a, alo, ahi, b, blo, bhi, size):
+    """找出在兩個區間內都只出現一次的 n-gram，返回互不重疊且順序一致的 (i, j, size) 列表"""
+    def unique_positions(seq, lo, hi):
+        positions = {}
+        for i in range(lo, hi - size + 1):
+            key = tuple(seq[i:i + size]) if size > 1 else seq[i]
+            positions[key] = -1 if key in positions else i
+        return positions
+    
+    a_pos = unique_positions(a, alo, ahi)
+    b_pos = unique_positions(b, blo, bhi)
+    pairs = [(i, b_pos[key]) for key, i in a_pos.items()
+             if i >= 0 and b_pos.get(key, -1) >= 0]
+    if not pairs:
+        return []
+    pairs.sort()
+    
+    # 以耐心排序求 j 的最長遞增子序列
+    tails = []
+    tail_idx = []
+    prev = [-1] * len(pairs)
+    for k, (_, j) in enumerate(pairs):
+        pos = bisect.bisect_left(tails, j)
+        if pos == len(tails):
+            tails.append(j)
+            tail_idx.append(k)
+        else:
+            tails[pos] = j
+            tail_idx[pos] = k
+        prev[k] = tail_idx[pos - 1] if pos > 0 else -1
+    chain = []
+    k = tail_idx[-1]
+    while k >= 0:
+        chain.append(pairs[k])
+        k = prev[k]
+    chain.reverse()
+    
+    # 合併同一對角線上重疊的錨點，丟棄與前一錨點交錯的錨點
+    anchors = []
+    for i, j in chain:
+        if anchors:
+            pi, pj, psize = anchors[-1]
+            if i - j == pi - pj and i <= pi + psize:
+                anchors[-1] = (pi, pj, i + size - pi)
+                continue
+            if i < pi + psize or j < pj + psize:
+                continue
+        anchors.append((i, j, size))
+    return anchors
+
+def _lcs_row(a, alo, ahi, b, blo, bhi, reverse=False):
+    """返回 a[alo:ahi] 與 b[blo:bhi] 各前綴 (reverse 時為後綴) 的 LCS 長度，只保留一行"""
+    a_items = a[alo:ahi]
+    b_items = b[blo:bhi]
+    if reverse:
+        a_items = a_items[::-1]
+        b_items = b_items[::-1]
+    row = [0] * (len(b_items) + 1)
+    for x in a_items:
+        new_row = [0]
+        left = 0
+        for j, y in enumerate(b_items):
+            left = row[j] + 1 if x == y else max(row[j + 1], left)
+            new_row.append(left)
+        row = new_row
+    return row
+
+def _hirschberg(a, alo, ahi, b, blo, bhi, blocks):
+    n = ahi - alo
+    m = bhi - blo
+    if n == 0 or m == 0:
+        return
+    if n == 1:
+        for j in range(blo, bhi):
+            if a[alo] == b[j]:
+                blocks.append((alo, j, 1))
+                break
+        return
+    
+    amid = (alo + ahi) // 2
+    forward = _lcs_row(a, alo, amid, b, blo, bhi)
+    backward = _lcs_row(a, amid, ahi, b, blo, bhi, reverse=True)
+    split = max(range(m + 1), key=lambda k: forward[k] + backward[m - k])
+    _hirschberg(a, alo, amid, b, blo, blo + split, blocks)
+    _hirschberg(a, amid, ahi, b, blo + split, bhi, blocks)
+
+def _blocks_to_opcodes(blocks, len_a, len_b):
+    # 合併相鄰的匹配塊，再按 SequenceMatcher 的規則生成操作碼
+    merged = []
+    for i, j, size in blocks:
+        if merged and merged[-1][0] + merged[-1][2] == i and merged[-1][1] + merged[-1][2] == j:
+            merged[-1] = (merged[-1][0], merged[-1][1], merged[-1][2] + size)
+        else:
+            merged.append((i, j, size))
+    merged.append((len_a, len_b, 0))
+    
+    opcodes = []
+    i = j = 0
+    for ai, bj, size in merged:
+        if i < ai and j < bj:
+            opcodes.append(('replace', i, ai, j, bj))
+        elif i < ai:
+            opcodes.append(('delete', i, ai, j, bj))
+        elif j < bj:
+            opcodes.append(('insert', i, ai, j, bj))
+        if size:
+            opcodes.append(('equal', ai, ai + size, bj, bj + size))
+        i, j = ai + size, bj + size
+    return opcodes
+
+class WordTimeline:
+    """以 NumPy 陣列保存的單字時間軸，取代每個單字一個字典的表示。
+
+    start/end 為 float64 陣列，單字與原始單字以 int32 編號指向共用的字串表 (相同單字只保存一次)，
+    segment 記錄單字所屬的轉錄段落 (-1 表示未知)。整數下標與迭代返回與舊格式相同的字典視圖，
+    切片、shift、slice_time 與 merge 均以向量化方式完成。
+    """
+    BINARY_MAGIC = b"WTL1"
+    
+    def __init__(self, words=(), starts=(), ends=(), original_words=None, segments=None, table=None):
+        self.table = table if table is not None else []
+        self._index = {}
+        self._indexed = 0
+        self.word_ids = np.fromiter((self.intern(w) for w in words), dtype=np.int32)
+        self.starts = np.asarray(starts, dtype=np.float64)
+        self.ends = np.asarray(ends, dtype=np.float64)
+        if original_words is None:
+            self.original_ids = np.full(len(self.word_ids), -1, dtype=np.int32)
+        else:
+            self.original_ids = np.fromiter(
+                (-1 if w is None else self.intern(w) for w in original_words), dtype=np.int32)
+        if segments is None:
+            self.segment_ids = np.full(len(self.word_ids), -1, dtype=np.int32)
+        else:
+            self.segment_ids = np.asarray(segments, dtype=np.int32)
+        self._end_envelope = None
+    
+    @classmethod
+    def _from_arrays(cls, table, word_ids, starts, ends, original_ids, segment_ids):
+        timeline = cls(table=table)
+        timeline.word_ids = word_ids
+        timeline.starts = starts
+        timeline.ends = ends
+        timeline.original_ids = original_ids
+        timeline.segment_ids = segment_ids
+        return timeline
+    
+    @classmethod
+    def from_dicts(cls, items, segment=None):
+        """由舊格式的單字字典 (word/start/end，可選 original_word) 建立"""
+        words, starts, ends, originals = [], [], [], []
+        for item in items:
+            words.append(item["word"])
+            starts.append(item["start"])
+            ends.append(item["end"])
+            originals.append(item.get("original_word"))
+        segments = None if segment is None else np.full(len(words), segment, dtype=np.int32)
+        return cls(words, starts, ends, originals, segments)
+    
+    @classmethod
+    def coerce(cls, words):
+        return words if isinstance(words, cls) else cls.from_dicts(words)
+    
+    @classmethod
+    def concatenate(cls, timelines):
+        """按順序連接多條時間軸，字串表合併到第一條的表中"""
+        timelines = [t for t in timelines if t is not None]
+        if not timelines:
+            return cls()
+        base = cls(table=list(timelines[0].table))
+        word_ids, original_ids = [], []
+        for timeline in timelines:
+            # 把各自的編號映射到合併後的字串表
+            remap = np.fromiter((base.intern(w) for w in timeline.table), dtype=np.int32,
+                                count=len(timeline.table))
+            remap = np.append(remap, np.int32(-1))
+            word_ids.append(remap[timeline.word_ids])
+            original_ids.append(remap[timeline.original_ids])
+        return cls._from_arrays(
+            base.table,
+            np.concatenate(word_ids),
+            np.concatenate([t.starts for t in timelines]),
+            np.concatenate([t.ends for t in timelines]),
+            np.concatenate(original_ids),
+            np.concatenate([t.segment_ids for t in timelines])
+        )
+    
+    def intern(self, word):
+        # 字串表可能被切片共用，先補上其他時間軸新增的字串
+        if self._indexed < len(self.table):
+            for i in range(self._indexed, len(self.table)):
+                self._index.setdefault(self.table[i], i)
+            self._indexed = len(self.table)
+        index = self._index.get(word)
+        if index is None:
+            index = len(self.table)
+            self.table.append(word)
+            self._index[word] = index
+            self._indexed += 1
+        return index
+    
+    def __len__(self):
+        return len(self.word_ids)
+    
+    def __iter__(self):
+        table = self.table
+        for word_id, start, end, original_id in zip(self.word_ids.tolist(), self.starts.tolist(),
+                                                    self.ends.tolist(), self.original_ids.tolist()):
+            item = {"word": table[word_id], "start": start, "end": end}
+            if original_id >= 0:
+                item["original_word"] = table[original_id]
+            yield item
+    
+    def __getitem__(self, index):
+        if isinstance(index, (slice, np.ndarray)):
+            return self.take(index)
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("WordTimeline index out of range")
+        item = {
+            "word": self.table[self.word_ids[index]],
+            "start": float(self.starts[index]),
+            "end": float(self.ends[index])
+        }
+        if self.original_ids[index] >= 0:
+            item["original_word"] = self.table[self.original_ids[index]]
+        return item
+    
+    def take(self, index):
+        """按切片、布爾遮罩或下標陣列選出子時間軸，字串表共用"""
+        return self._from_arrays(
+            self.table,
+            self.word_ids[index],
+            self.starts[index],
+            self.ends[index],
+            self.original_ids[index],
+            self.segment_ids[index]
+        )
+    
+    def words(self):
+        table = self.table
+        return [table[i] for i in self.word_ids.tolist()]
+    
+    def to_dicts(self):
+        """舊格式的字典列表"""
+        return list(self)
+    
+    def shift(self, offset):
+        """所有時間就地加上 offset 秒，返回自身"""
+        self.starts = np.round(self.starts + offset, 3)
+        self.ends = np.round(self.ends + offset, 3)
+        self._end_envelope = None
+        return self
+    
+    def sorted_by_start(self):
+        if len(self) < 2 or bool(np.all(self.starts[1:] >= self.starts[:-1])):
+            return self
+        return self.take(np.argsort(self.starts, kind="stable"))
+    
+    def slice_time(self, start, end, overlap=False):
+        """選出開始時間落在 [start, end) 內的單字；overlap 為 True 時選出與該區間重疊的單字。
+
+        要求時間軸已按開始時間排序。
+        """
+        hi = int(np.searchsorted(self.starts, end, side="left"))
+        if not overlap:
+            lo = int(np.searchsorted(self.starts, start, side="left"))
+            return self.take(slice(lo, hi))
+        # 結束時間的累積最大值單調遞增，可以二分找到第一個可能重疊的單字
+        if self._end_envelope is None:
+            self._end_envelope = np.maximum.accumulate(self.ends) if len(self) else self.ends
+        lo = int(np.searchsorted(self._end_envelope, start, side="right"))
+        lo = min(lo, hi)
+        return self.take(np.arange(lo, hi)[self.ends[lo:hi] > start])
+    
+    def merge(self, other):
+        """合併兩條時間軸並按開始時間排序 (穩定排序，時間相同時保留原有先後)"""
+        return WordTimeline.concatenate([self, other]).sorted_by_start()
+    
+    def drop_overlapping_duplicates(self):
+        """刪除與前一個單字相同且時間重疊的單字，用於合併重疊區域"""
+        if len(self) < 2:
+            return self
+        duplicate = np.zeros(len(self), dtype=bool)
+        duplicate[1:] = (self.word_ids[1:] == self.word_ids[:-1]) & (self.starts[1:] < self.ends[:-1])
+        return self.take(~duplicate) if duplicate.any() else self
+    
+    def write_json(self, f):
+        """直接寫出 {"words": [...]}，格式與 json.dump(..., indent=2) 相同"""
+        f.write('{\n  "words": [')
+        encoded = [json.dumps(word) for word in self.table]
+        separator = "\n"
+        for word_id, start, end in zip(self.word_ids.tolist(), self.starts.tolist(), self.ends.tolist()):
+            f.write(f'{separator}    {{\n      "word": {encoded[word_id]},\n'
+                    f'      "start": {start!r},\n      "end": {end!r}\n    }}')
+            separator = ",\n"
+        f.write("]\n}" if separator == "\n" else "\n  ]\n}")
+    
+    def to_bytes(self):
+        """緊湊的二進位格式：檔頭、各欄位陣列 (小端序) 與以 NUL 分隔的字串表"""
+        table = "\0".join(self.table).encode('utf-8')
+        header = struct.pack("<4sIII", self.BINARY_MAGIC, len(self), len(self.table), len(table))
+        return b"".join([
+            header,
+            self.starts.astype("<f8").tobytes(),
+            self.ends.astype("<f8").tobytes(),
+            self.word_ids.astype("<i4").tobytes(),
+            self.original_ids.astype("<i4").tobytes(),
+            self.segment_ids.astype("<i4").tobytes(),
+            table
+        ])
+    
+    @classmethod
+    def from_bytes(cls, data):
+        magic, count, table_count, table_size = struct.unpack_from("<4sIII", data)
+        if magic != cls.BINARY_MAGIC:
+            raise ValueError("不是有效的時間軸二進位數據")
+        offset = struct.calcsize("<4sIII")
+        arrays = []
+        for stored, native in (("<f8", np.float64), ("<f8", np.float64),
+                               ("<i4", np.int32), ("<i4", np.int32), ("<i4", np.int32)):
+            array = np.frombuffer(data, dtype=stored, count=count, offset=offset)
+            arrays.append(array.astype(native))
+            offset += array.nbytes
+        raw_table = data[offset:offset + table_size].decode('utf-8')
+        table = raw_table.split("\0") if table_count else []
+        starts, ends, word_ids, original_ids, segment_ids = arrays
+        return cls._from_arrays(table, word_ids, starts, ends, original_ids, segment_ids)
+    
+    def save(self, path):
+        with open(path + ".tmp", 'wb') as f:
+            f.write(self.to_bytes())
+        os.replace(path + ".tmp", path)
+    
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            return cls.from_bytes(f.read())
+
+# 替換與插入區間的時間分配方式：uniform 平均分配，chars 按單字字元數加權
+TIMING_WEIGHT_CHOICES = ("uniform", "chars")
+
+def redistribute_timestamps(opcodes, ref_words, starts, ends, weighting="uniform"):
+    """按對齊操作碼把轉錄單字的時間分配給參考單字，返回 (參考單字下標, 開始時間, 結束時間) 三個陣列。
+
+    equal 區間沿用對應轉錄單字的時間；replace 區間把被替換單字的總時長、insert 區間把前後單字之間的空隙
+    分給區間內的參考單字。逐個操作碼只記錄區間的起點與時長，所有單字的時間最後一次以 NumPy 算出，
+    結果按操作碼順序排列 (轉錄時間有序時即按開始時間排序)。操作碼的下標是絕對位置，
+    因此也可以只傳入一段連續的操作碼，只計算該區間的參考單字。
+    """
+    if weighting not in TIMING_WEIGHT_CHOICES:
+        raise ValueError(f"未知的時間分配方式: {weighting}")
+    starts = np.ascontiguousarray(starts, dtype=np.float64)
+    ends = np.ascontiguousarray(ends, dtype=np.float64)
+    # 逐個操作碼讀取的時間經 memoryview 取出，不必先把整個陣列轉成列表 (只計算一小段操作碼時也不隨長度增加)
+    start_list = starts.data
+    end_list = ends.data
+    num_timestamps = len(starts)
+    
+    # 每個輸出區間: 參考單字起點、單字數、對應的轉錄單字起點 (-1 表示需要插值)、插值起點與時長
+    ref_first, lengths, trans_first, span_start, span_length = [], [], [], [], []
+    for tag, i1, i2, j1, j2 in opcodes:
+        if tag == 'equal':
+            count = min(i2, num_timestamps) - i1
+            if count > 0:
+                ref_first.append(j1)
+                lengths.append(count)
+                trans_first.append(i1)
+                span_start.append(0.0)
+                span_length.append(0.0)
+        elif tag == 'replace':
+            if i1 < num_timestamps:
+                first = start_list[i1]
+                last = end_list[min(i2, num_timestamps) - 1]
+                ref_first.append(j1)
+                lengths.append(j2 - j1)
+                trans_first.append(-1)
+                span_start.append(first)
+                span_length.append(last - first)
+        elif tag == 'insert' and num_timestamps > 0:
+            # 插入到開頭或結尾時沒有相鄰單字，假設 0.5 秒的空隙
+            if i1 == 0:
+                next_time = start_list[0]
+                prev_time = max(0, next_time - 0.5)
+            elif i1 >= num_timestamps:
+                prev_time = end_list[-1]
+                next_time = prev_time + 0.5
+            else:
+                prev_time = end_list[i1 - 1]
+                next_time = start_list[i1]
+            ref_first.append(j1)
+            lengths.append(j2 - j1)
+            trans_first.append(-1)
+            span_start.append(prev_time)
+            span_length.append(next_time - prev_time)
+    
+    lengths = np.array(lengths, dtype=np.int64)
+    offsets = np.cumsum(lengths) - lengths
+    owner = np.repeat(np.arange(len(lengths)), lengths)
+    k = np.arange(len(owner)) - offsets[owner]
+    ref_index = np.array(ref_first, dtype=np.int64)[owner] + k
+    
+    trans_index = np.array(trans_first, dtype=np.int64)[owner]
+    copied = trans_index >= 0
+    out_starts = np.empty(len(owner))
+    out_ends = np.empty(len(owner))
+    out_starts[copied] = starts[trans_index[copied] + k[copied]]
+    out_ends[copied] = ends[trans_index[copied] + k[copied]]
+    
+    interpolated = ~copied
+    base = np.array(span_start, dtype=np.float64)[owner[interpolated]]
+    duration = np.array(span_length, dtype=np.float64)[owner[interpolated]]
+    if weighting == "chars":
+        # 區間內的累積字元數決定每個單字的起止比例，整條序列只做一次累加
+        weights = np.fromiter((len(ref_words[j]) for j in ref_index.tolist()), dtype=np.float64,
+                              count=len(ref_index))
+        weights[copied] = 1.0  # equal 區間的比例不會用到，只避免除以零
+        cumulative = np.cumsum(weights)
+        before = cumulative - weights
+        span_before = before[offsets][owner]
+        span_total = (cumulative[offsets + lengths - 1] - before[offsets])[owner]
+        lo = (before - span_before) / span_total
+        hi = (cumulative - span_before) / span_total
+        out_starts[interpolated] = base + lo[interpolated] * duration
+        out_ends[interpolated] = base + hi[interpolated] * duration
+    else:
+        step = duration / lengths[owner[interpolated]]
+        out_starts[interpolated] = base + k[interpolated] * step
+        out_ends[interpolated] = out_starts[interpolated] + step
+    return ref_index, out_starts, out_ends
+
+def correct_transcription(transcription, reference_text, word_timestamps, weighting="uniform", language=None):
+    """以參考文本修正轉錄，參考單字的時間由對齊結果分配，返回 (修正後文本, WordTimeline)。
+
+    轉錄一方直接使用時間軸上轉錄時已清理的單字，不再重新切分 transcription；
+    參考文本只切分與清理一次，原始形式 (保留大小寫與標點) 記錄為修正後單字的 original_word。
+    """
+    word_timestamps = WordTimeline.coerce(word_timestamps)
+    cjk = uses_cjk(reference_text, language)
+    trans_words, trans_starts, trans_ends = timeline_tokens(word_timestamps, cjk)
+    ref_raw, ref_words = tokenize(reference_text, language)
+    
+    opcodes = align_words(trans_words, ref_words)
+    
+    ref_index, starts, ends = redistribute_timestamps(opcodes, ref_words, trans_starts, trans_ends, weighting)
+    
+    reference = WordTimeline(ref_words, original_words=ref_raw)
+    # 輸出已按操作碼順序排列，sorted_by_start 只在轉錄時間本身重疊時才會真正重排
+    corrected_timestamps = WordTimeline._from_arrays(
+        reference.table, reference.word_ids[ref_index], np.round(starts, 3), np.round(ends, 3),
+        reference.original_ids[ref_index], np.full(len(ref_index), -1, dtype=np.int32)
+    ).sorted_by_start()
+    
+    corrected_transcription = " ".join(reference_text.split())
+    
+    return corrected_transcription, corrected_timestamps
+
+# 增量重新對齊時在改動的單字兩側額外重新對齊的單字數，讓邊界附近的對齊可以重新選擇
+REALIGN_CONTEXT = 16
+_OPCODE_CODES = {"equal": 0, "replace": 1, "delete": 2, "insert": 3}
+_OPCODE_TAGS = tuple(_OPCODE_CODES)
+
+def _common_prefix_length(a, b):
+    """兩個字串的共同前綴長度；以切片比較二分查找，比逐字比較快得多"""
+    lo, hi = 0, min(len(a), len(b))
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[:mid] == b[:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+def _common_suffix_length(a, b, limit):
+    lo, hi = 0, limit
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[len(a) - mid:] == b[len(b) - mid:]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+class IncrementalAligner:
+    """保存一次參考文本修正的對齊狀態 (單字、操作碼與時間軸)，參考文本修改後只重新對齊改動的部分。
+
+    update 以字串比較找出新舊參考文本的共同前綴與後綴，只重新切分中間改動的字元；
+    改動的單字向兩側擴展 REALIGN_CONTEXT 個單字後，截到最近的 equal 區間 (兩邊逐字對應，可在任意位置切開)
+    作為錨點，只有兩個錨點之間的轉錄與參考單字重新對齊，其餘操作碼沿用並平移參考下標。
+    時間軸按操作碼順序排列，每個參考單字恰好一行，因此改動區間的行可以直接替換。
+    """
+    def __init__(self, transcription, word_timestamps, reference_text, weighting="uniform", language=None):
+        self.transcription = transcription
+        self.weighting = weighting
+        self.cjk = uses_cjk(reference_text, language)
+        word_timestamps = WordTimeline.coerce(word_timestamps)
+        # 轉錄的單字時間，用於判斷之後的轉錄是否與此相同 (不同設定可能得出相同文本但不同時間)
+        self.source_starts = word_timestamps.starts
+        self.source_ends = word_timestamps.ends
+        self.trans_words, self.trans_starts, self.trans_ends = timeline_tokens(word_timestamps, self.cjk)
+        
+        self.reference_text = reference_text
+        self.ref_raw, self.ref_words, token_starts, token_ends = _token_spans(reference_text, self.cjk)
+        self.token_starts = np.array(token_starts, dtype=np.int64)
+        self.token_ends = np.array(token_ends, dtype=np.int64)
+        
+        opcodes = align_words(self.trans_words, self.ref_words)
+        self.tags, self.spans = self._opcode_arrays(opcodes)
+        # vocabulary 只作為字串表使用，與時間軸共用同一個表
+        self.vocabulary = WordTimeline(self.ref_words, original_words=self.ref_raw)
+        ref_index, starts, ends = redistribute_timestamps(
+            opcodes, self.ref_words, self.trans_starts, self.trans_ends, weighting)
+        self.timeline = WordTimeline._from_arrays(
+            self.vocabulary.table, self.vocabulary.word_ids[ref_index], np.round(starts, 3), np.round(ends, 3),
+            self.vocabulary.original_ids[ref_index], np.full(len(ref_index), -1, dtype=np.int32)
+        )
+        self.last_window = None
+    
+    def reusable(self, transcription, word_timestamps, weighting, cjk):
+        """轉錄 (文本與單字時間) 與對齊設定都相同時，對齊狀態可以沿用"""
+        word_timestamps = WordTimeline.coerce(word_timestamps)
+        return (self.transcription == transcription and self.weighting == weighting and self.cjk == cjk
+                and np.array_equal(self.source_starts, word_timestamps.starts)
+                and np.array_equal(self.source_ends, word_timestamps.ends))
+    
+    @staticmethod
+    def _opcode_arrays(opcodes):
+        tags = np.fromiter((_OPCODE_CODES[op[0]] for op in opcodes), dtype=np.int8, count=len(opcodes))
+        spans = np.array([op[1:] for op in opcodes], dtype=np.int64).reshape(-1, 4)
+        return tags, spans
+    
+    def _anchor(self, target, before):
+        """在 equal 區間內找切點，返回 (轉錄下標, 參考下標, 操作碼位置)。
+
+        before 為 True 時找參考下標 <= target 的最後一個切點，否則找 >= target 的第一個；
+        找不到時操作碼位置為 None，切點為序列的開頭或結尾。
+        """
+        equal = np.flatnonzero(self.tags == 0)
+        i1, _, j1, j2 = self.spans[equal].T
+        if before:
+            pos = int(np.searchsorted(j1, target, side="right")) - 1
+            if pos < 0:
+                return 0, 0, None
+            j = min(target, int(j2[pos]))
+        else:
+            pos = int(np.searchsorted(j2, target, side="left"))
+            if pos == len(equal):
+                return len(self.trans_words), len(self.ref_words), None
+            j = max(target, int(j1[pos]))
+        return int(i1[pos]) + j - int(j1[pos]), j, int(equal[pos])
+    
+    def update(self, reference_text):
+        """換成修改後的參考文本，只重新對齊改動附近的區間並替換時間軸上對應的行，返回 (修正後文本, WordTimeline)"""
+        old_text = self.reference_text
+        if reference_text == old_text:
+            return self.result()
+        prefix = _common_prefix_length(old_text, reference_text)
+        suffix = _common_suffix_length(old_text, reference_text, min(len(old_text), len(reference_text)) - prefix)
+        delta = len(reference_text) - len(old_text)
+        
+        # 與改動的字元重疊或相接的舊單字 [t1, t2) 都重新切分
+        t1 = int(np.searchsorted(self.token_ends, prefix, side="left"))
+        t2 = int(np.searchsorted(self.token_starts, len(old_text) - suffix, side="right"))
+        c1 = int(self.token_ends[t1 - 1]) if t1 > 0 else 0
+        c2 = int(self.token_starts[t2]) if t2 < len(self.ref_words) else len(old_text)
+        raw, words, starts, ends = _token_spans(reference_text[c1:c2 + delta], self.cjk, c1)
+        shift = len(words) - (t2 - t1)
+        
+        trans_lo, ref_lo, first = self._anchor(max(0, t1 - REALIGN_CONTEXT), True)
+        trans_hi, ref_hi, last = self._anchor(min(len(self.ref_words), t2 + REALIGN_CONTEXT), False)
+        
+        self.ref_raw[t1:t2] = raw
+        self.ref_words[t1:t2] = words
+        self.token_starts = np.concatenate((self.token_starts[:t1], np.array(starts, dtype=np.int64),
+                                            self.token_starts[t2:] + delta))
+        self.token_ends = np.concatenate((self.token_ends[:t1], np.array(ends, dtype=np.int64),
+                                          self.token_ends[t2:] + delta))
+        self.reference_text = reference_text
+        
+        window = [(tag, i1 + trans_lo, i2 + trans_lo, j1 + ref_lo, j2 + ref_lo) for tag, i1, i2, j1, j2 in
+                  align_words(self.trans_words[trans_lo:trans_hi], self.ref_words[ref_lo:ref_hi + shift])]
+        
+        # 錨點所在的 equal 區間在切點處分開，前半保留在前面，後半保留在後面
+        head_tags, head_spans = self.tags[:0], self.spans[:0]
+        if first is not None:
+            i1, _, j1, _ = self.spans[first].tolist()
+            head_tags, head_spans = self.tags[:first], self.spans[:first]
+            if ref_lo > j1:
+                head_tags = np.append(head_tags, np.int8(0))
+                head_spans = np.vstack((head_spans, [i1, trans_lo, j1, ref_lo]))
+        tail_tags, tail_spans = self.tags[:0], self.spans[:0]
+        if last is not None:
+            _, i2, _, j2 = self.spans[last].tolist()
+            tail_tags, tail_spans = self.tags[last + 1:], self.spans[last + 1:]
+            if ref_hi < j2:
+                tail_tags = np.concatenate(([np.int8(0)], tail_tags))
+                tail_spans = np.vstack(([trans_hi, i2, ref_hi, j2], tail_spans))
+            tail_spans = tail_spans + np.array([0, 0, shift, shift], dtype=np.int64)
+        window_tags, window_spans = self._opcode_arrays(window)
+        self.tags = np.concatenate((head_tags, window_tags, tail_tags)).astype(np.int8)
+        self.spans = np.vstack((head_spans, window_spans, tail_spans))
+        
+        ref_index, starts, ends = redistribute_timestamps(
+            window, self.ref_words, self.trans_starts, self.trans_ends, self.weighting)
+        vocabulary = self.vocabulary
+        word_ids = np.fromiter((vocabulary.intern(self.ref_words[j]) for j in ref_index.tolist()),
+                               dtype=np.int32, count=len(ref_index))
+        original_ids = np.fromiter((vocabulary.intern(self.ref_raw[j]) for j in ref_index.tolist()),
+                                   dtype=np.int32, count=len(ref_index))
+        
+        timeline = self.timeline
+        rows = slice(ref_lo, ref_hi) if len(timeline) else slice(0, 0)
+        
+        def splice(array, middle):
+            return np.concatenate((array[:rows.start], middle.astype(array.dtype), array[rows.stop:]))
+        
+        timeline.word_ids = splice(timeline.word_ids, word_ids)
+        timeline.starts = splice(timeline.starts, np.round(starts, 3))
+        timeline.ends = splice(timeline.ends, np.round(ends, 3))
+        timeline.original_ids = splice(timeline.original_ids, original_ids)
+        timeline.segment_ids = splice(timeline.segment_ids, np.full(len(ref_index), -1, dtype=np.int32))
+        timeline._end_envelope = None
+        
+        self.last_window = {
+            "transcription": (trans_lo, trans_hi),
+            "reference": (ref_lo, ref_hi + shift),
+            "opcodes": len(window)
+        }
+        return self.result()
+    
+    def result(self):
+        """返回 (修正後文本, WordTimeline)；時間軸為副本，不受之後的 update 影響"""
+        timeline = self.timeline
+        snapshot = WordTimeline._from_arrays(
+            list(timeline.table), timeline.word_ids.copy(), timeline.starts.copy(), timeline.ends.copy(),
+            timeline.original_ids.copy(), timeline.segment_ids.copy()
+        )
+        return " ".join(self.reference_text.split()), snapshot
+
+class AlignmentStore:
+    """進程內保存最近使用的 IncrementalAligner，同一音頻以修改過的參考文本重新修正時只重新對齊改動的部分"""
+    def __init__(self, capacity=4):
+        self.capacity = capacity
+        self._aligners = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def correct(self, key, transcription, word_timestamps, reference_text, weighting="uniform", language=None):
+        """與 correct_transcription 相同，返回 (修正後文本, WordTimeline)"""
+        # 使用中的對齊狀態先從表中取出，同一音頻的並行任務各自完整對齊，不會同時修改同一個狀態
+        with self._lock:
+            aligner = self._aligners.pop(key, None)
+        if aligner is not None and aligner.reusable(transcription, word_timestamps, weighting,
+                                                    uses_cjk(reference_text, language)):
+            result = aligner.update(reference_text)
+        else:
+            aligner = IncrementalAligner(transcription, word_timestamps, reference_text, weighting, language)
+            result = aligner.result()
+        with self._lock:
+            self._aligners[key] = aligner
+            while len(self._aligners) > self.capacity:
+                self._aligners.popitem(last=False)
+        return result
+
+ALIGNMENTS = AlignmentStore()
+
+def collect_segments(segments):
+    """把逐段結果收集為 (轉錄文本, WordTimeline)，單字記錄所屬段落的序號"""
+    transcription = ""
+    words, starts, ends, originals, segment_ids = [], [], [], [], []
+    for index, segment in enumerate(segments):
+        transcription += segment["text"] + " "
+        for word in segment["words"]:
+            words.append(word["word"])
+            starts.append(word["start"])
+            ends.append(word["end"])
+            originals.append(word.get("original_word"))
+            segment_ids.append(index)
+    return transcription.strip(), WordTimeline(words, starts, ends, originals, segment_ids)
+
+def build_result(transcription, word_timestamps, reference_text=None, metrics=None, weighting="uniform",
+                 alignment_key=None, language=None):
+    """alignment_key 不為 None 時 (例如音頻路徑) 保留對齊狀態，同一音頻再次修正時只重新對齊參考文本改動的部分。
+
+    language 為 Whisper 檢測到的語言 (例如 info.language)，決定參考文本是否按 CJK 逐字切分；None 時自動判斷。
+    """
+    if reference_text:
+        print("使用參考文本修正轉錄...")
+        with timed(metrics, "alignment"):
+            if alignment_key is None:
+                corrected_transcription, corrected_timestamps = correct_transcription(
+                    transcription, 
+                    reference_text, 
+                    word_timestamps,
+                    weighting,
+                    language
+                )
+            else:
+                corrected_transcription, corrected_timestamps = ALIGNMENTS.correct(
+                    alignment_key, transcription, word_timestamps, reference_text, weighting, language)
+        return {
+            "original_transcription": transcription,
+            "corrected_transcription": corrected_transcription,
+            "words": corrected_timestamps
+        }
+    return {
+        "transcription": transcription,
+        "words": word_timestamps
+    }
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "AudioChronoText")
+DEFAULT_CACHE_SIZE = 2 * 1024 ** 3
+
+def temp_path_for(path):
+    """寫入 path 前使用的臨時文件；同一進程內的多個線程與多個進程可能同時寫入同一文件，各自使用不同的臨時文件"""
+    return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+def file_key(path):
+    """以絕對路徑、大小與修改時間組成的文件鍵，文件被替換或修改後即改變"""
+    stat = os.stat(path)
+    key = f"{os.path.abspath(path)}\0{stat.st_size}\0{stat.st_mtime_ns}"
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+class DiskCache:
+    """每個條目一個文件 (擴展名為 SUFFIX) 的磁碟快取目錄。
+
+    讀取條目時由子類更新其修改時間，總大小超過 max_bytes 時刪除最久未使用的條目。
+    """
+    SUFFIX = ""
+    
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+    
+    def entries(self):
+        """返回 (修改時間, 大小, 路徑) 列表，按最久未使用排序"""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(self.SUFFIX):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+        return entries
+    
+    def evict(self):
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                # 其他進程可能已經刪除了同一條目
+                pass
+            total -= size
+    
+    def clear(self):
+        for _, _, path in self.entries():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+    
+    def stats(self):
+        entries = self.entries()
+        return {
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+            "max_bytes": self.max_bytes
+        }
+
+class TranscriptionCache(DiskCache):
+    """以音頻內容雜湊與模型設定為鍵的磁碟快取，保存修正前的轉錄與單字時間戳。
+
+    每個條目是一個 JSON Lines 文件：第一行為轉錄文本與時長，其後每行一個單字。
+    讀取時更新修改時間，總大小超過 max_bytes 時刪除最久未使用的條目。
+    """
+    SUFFIX = ".jsonl"
+    
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_CACHE_SIZE):
+        super().__init__(cache_dir, max_bytes)
+        self.hits = 0
+        self.misses = 0
+    
+    def make_key(self, audio_path, settings):
+        digest = hashlib.sha256()
+        with open(audio_path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        digest.update(json.dumps(settings, sort_keys=True).encode('utf-8'))
+        return digest.hexdigest()
+    
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.jsonl")
+    
+    def get(self, key):
+        path = self._entry_path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                header = json.loads(f.readline())
+                words = [json.loads(line) for line in f]
+            os.utime(path)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        header["words"] = WordTimeline.from_dicts(words)
+        return header
+    
+    def put(self, key, transcription, words, duration, language=None):
+        """寫入一個條目；words 可以是任意可迭代對象，逐行寫出。language 為檢測到的語言，讀取時用於修正"""
+        path = self._entry_path(key)
+        temp_path = temp_path_for(path)
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({"transcription": transcription, "duration": duration, "language": language},
+                               ensure_ascii=False))
+            f.write("\n")
+            for word in words:
+                f.write(json.dumps(word, ensure_ascii=False))
+                f.write("\n")
+        os.replace(temp_path, path)
+        self.evict()
+    
+    def stats(self):
+        lookups = self.hits + self.misses
+        stats = {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+        stats.update(super().stats())
+        return stats
+
+DEFAULT_CONFIG_PATH = os.path.join(os.path.expanduser("~"), ".config", "AudioChronoText", "config.json")
+DEFAULT_CONFIG = {
+    "model": "large-v2",
+    "device": "cpu",
+    "compute_type": "default",
+    "cpu_threads": 0,
+    "num_workers": 1,
+    "beam_size": 5,
+    "vad_filter": False,
+    "export_formats": ["txt", "json"],
+    "subtitle_max_chars": 42,
+    "subtitle_max_duration": 5.0,
+    "subtitle_by_segment": True,
+    "timing_weight": "uniform",
+    "segment_cache": False,
+    "parallel_jobs": 1
+}
+MODEL_CHOICES = ("tiny", "base", "small", "medium", "large-v2", "large-v3", "distil-large-v3")
+COMPUTE_TYPE_CHOICES = ("default", "int8", "int8_float32", "int16", "float32")
+
+def load_config(path=None, overrides=None):
+    """讀取 JSON 設定文件並套用覆蓋值；path 為 None 時使用預設路徑 (不存在則用預設值)"""
+    config = dict(DEFAULT_CONFIG)
+    if path is None and os.path.isfile(DEFAULT_CONFIG_PATH):
+        path = DEFAULT_CONFIG_PATH
+    if path is not None:
+        with open(path, 'r', encoding='utf-8') as f:
+            config.update(json.load(f))
+    for key, value in (overrides or {}).items():
+        if value is not None:
+            config[key] = value
+    
+    unknown = set(config) - set(DEFAULT_CONFIG)
+    if unknown:
+        raise ValueError(f"未知的設定項: {', '.join(sorted(unknown))}")
+    return config
+
+def save_config(config, path=DEFAULT_CONFIG_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(config, f, indent=2)
+
+def transcribe_options(config):
+    return {
+        "word_timestamps": True,
+        "beam_size": config["beam_size"],
+        "vad_filter": config["vad_filter"]
+    }
+
+def cache_settings(config, **extra):
+    """影響轉錄結果的所有設定，作為快取鍵的一部分 (線程數不影響結果，不包含在內)"""
+    settings = {
+        "model": config["model"],
+        "device": config["device"],
+        "compute_type": config["compute_type"],
+        "options": transcribe_options(config)
+    }
+    settings.update(extra)
+    return settings
+
+def lookup_cache(cache, audio_path, settings):
+    """查詢快取，返回 (快取鍵, 快取內容)；未啟用快取時均為 None"""
+    if cache is None:
+        return None, None
+    key = cache.make_key(audio_path, settings)
+    cached = cache.get(key)
+    if cached is not None:
+        print("使用快取的轉錄結果...")
+    return key, cached
+
+MODEL_IDLE_TIMEOUT = 600
+
+def current_rss():
+    """當前進程的常駐記憶體 (字節)，無法讀取時返回 0"""
+    try:
+        with open("/proc/self/statm", 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+def available_memory():
+    """系統可用記憶體 (字節)，無法讀取時返回 0"""
+    try:
+        with open("/proc/meminfo", 'r') as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return 0
+
+def peak_rss():
+    """當前進程常駐記憶體的峰值 (字節)，無法讀取時返回 0"""
+    try:
+        with open("/proc/self/status", 'r') as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return 0
+
+# VmHWM 是整個進程的峰值：每個任務開始時把它重設為當前常駐記憶體，使峰值只反映該任務開始之後。
+# 同一進程內並行的任務共用這一標記，重設前的峰值先計入所有進行中的任務
+_peak_lock = threading.Lock()
+_active_metrics = weakref.WeakSet()
+
+def reset_peak_rss():
+    """把進程的常駐記憶體峰值重設為當前值 (Linux 的 /proc/self/clear_refs)，成功時返回 True"""
+    try:
+        with open("/proc/self/clear_refs", 'w') as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+class JobMetrics:
+    """一個轉錄任務的分階段計時與資源指標，record() 返回可寫成 JSON 的記錄。
+
+    階段: model_load 載入模型、cache_lookup 計算快取鍵、decode 解碼與重採樣、
+    prepare 調用 model.transcribe (VAD 過濾、特徵提取與語言檢測)、inference 逐段推理、
+    alignment 以參考文本修正、output 寫出結果文件、cache_write 寫入快取。
+    同一階段多次計時時累加。peak_rss_scope 為 job 時 peak_rss_mb 是任務期間的峰值，
+    無法重設進程峰值時為 process (進程啟動以來的峰值)。
+    """
+    def __init__(self, audio_path=None, config=None):
+        self.audio_path = audio_path
+        self.config = config
+        self.stages = {}
+        self.values = {}
+        self.started = time.time()
+        self._start_time = time.perf_counter()
+        self._peak = 0
+        with _peak_lock:
+            peak = peak_rss()
+            for metrics in _active_metrics:
+                metrics._peak = max(metrics._peak, peak)
+            self._peak_scope = "job" if reset_peak_rss() else "process"
+            _active_metrics.add(self)
+    
+    @contextlib.contextmanager
+    def stage(self, name):
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_stage(name, time.perf_counter() - start_time)
+    
+    def add_stage(self, name, seconds):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+    
+    def set(self, **values):
+        self.values.update(values)
+    
+    def record(self):
+        wall_seconds = time.perf_counter() - self._start_time
+        with _peak_lock:
+            peak = max(self._peak, peak_rss())
+            _active_metrics.discard(self)
+        record = {
+            "audio_path": self.audio_path,
+            "started": self.started,
+            "wall_seconds": round(wall_seconds, 3),
+            "stages": {name: round(seconds, 3) for name, seconds in self.stages.items()},
+            "peak_rss_mb": round(peak / 1024 ** 2, 1),
+            "peak_rss_scope": self._peak_scope,
+            "rss_mb": round(current_rss() / 1024 ** 2, 1)
+        }
+        if self.config is not None:
+            record.update(model=self.config["model"], compute_type=self.config["compute_type"],
+                          beam_size=self.config["beam_size"], vad_filter=self.config["vad_filter"])
+        record.update(self.values)
+        duration = record.get("duration")
+        if duration:
+            record["real_time_factor"] = round(wall_seconds / duration, 4)
+        return record
+
+def timed(metrics, name):
+    """metrics 為 None 時不計時"""
+    return metrics.stage(name) if metrics is not None else contextlib.nullcontext()
+
+PROFILERS = ("cprofile", "pyinstrument")
+
+def check_profiler(kind):
+    """所選的分析器不可用時拋出 ValueError"""
+    if kind not in PROFILERS:
+        raise ValueError(f"未知的分析器: {kind}")
+    if kind == "pyinstrument" and importlib.util.find_spec("pyinstrument") is None:
+        raise ValueError("需要安裝 pyinstrument: pip install pyinstrument")
+
+@contextlib.contextmanager
+def profiled(kind, output_base):
+    """kind 為 None 時不做任何事；cprofile 寫出 <output_base>.prof (pstats 格式)，
+    pyinstrument 寫出 <output_base>.profile.html"""
+    if kind is None:
+        yield
+        return
+    if kind == "pyinstrument":
+        from pyinstrument import Profiler
+        profiler = Profiler()
+        profiler.start()
+        try:
+            yield
+        finally:
+            profiler.stop()
+            with open(output_base + ".profile.html", 'w', encoding='utf-8') as f:
+                f.write(profiler.output_html())
+    else:
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            profiler.dump_stats(output_base + ".prof")
+
+class ModelRegistry:
+    """進程內共享的 WhisperModel 登記表。
+
+    相同設定的調用者 (界面、批次、服務) 共用同一個已載入的模型並記錄引用計數，
+    引用計數為零且閒置超過 idle_timeout 秒的模型會被卸載以釋放記憶體。
+    """
+    def __init__(self, idle_timeout=MODEL_IDLE_TIMEOUT):
+        self.idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        # 同一時間只載入一個模型，使記憶體增量可以歸屬到單個模型
+        self._load_lock = threading.Lock()
+        self._entries = {}
+        self._reaper = None
+    
+    @staticmethod
+    def model_key(config):
+        return (config["model"], config["device"], config["compute_type"],
+                config["cpu_threads"], config["num_workers"])
+    
+    def _entry_for(self, config):
+        """返回 (條目, 是否需要由調用者載入)，調用時必須持有 self._lock"""
+        key = self.model_key(config)
+        entry = self._entries.get(key)
+        if entry is not None:
+            return entry, False
+        entry = {
+            "key": key,
+            "model": None,
+            "refs": 0,
+            "ready": threading.Event(),
+            "error": None,
+            "load_seconds": 0.0,
+            "rss_bytes": 0,
+            "last_used": time.time()
+        }
+        self._entries[key] = entry
+        return entry, True
+    
+    def _load(self, entry, config):
+        with self._load_lock:
+            print(f"載入 Faster Whisper {config['model']} 模型於 {config['device']} ({config['compute_type']})...")
+            rss_before = current_rss()
+            start_time = time.perf_counter()
+            try:
+                entry["model"] = WhisperModel(
+                    config["model"],
+                    device=config["device"],
+                    compute_type=config["compute_type"],
+                    cpu_threads=config["cpu_threads"],
+                    num_workers=config["num_workers"]
+                )
+            except Exception as e:
+                print(f"模型載入出錯: {e}")
+                entry["error"] = e
+                with self._lock:
+                    self._entries.pop(entry["key"], None)
+            else:
+                entry["load_seconds"] = time.perf_counter() - start_time
+                entry["rss_bytes"] = max(0, current_rss() - rss_before)
+                print(f"模型載入成功，用時 {entry['load_seconds']:.1f} 秒，"
+                      f"常駐記憶體增加 {entry['rss_bytes'] / 1024 ** 2:.0f} MB")
+            finally:
+                entry["last_used"] = time.time()
+                entry["ready"].set()
+        self._start_reaper()
+    
+    def preload(self, config):
+        """在背景線程中載入模型，不增加引用計數；返回該線程"""
+        def run():
+            with self._lock:
+                entry, needs_load = self._entry_for(config)
+            if needs_load:
+                self._load(entry, config)
+        
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        return thread
+    
+    def acquire(self, config):
+        """取得共享模型並增加引用計數，模型正在背景載入時等待其完成"""
+        with self._lock:
+            entry, needs_load = self._entry_for(config)
+            entry["refs"] += 1
+        if needs_load:
+            self._load(entry, config)
+        entry["ready"].wait()
+        if entry["error"] is not None:
+            with self._lock:
+                entry["refs"] -= 1
+            raise entry["error"]
+        return entry["model"]
+    
+    def release(self, config):
+        with self._lock:
+            entry = self._entries.get(self.model_key(config))
+            if entry is not None and entry["refs"] > 0:
+                entry["refs"] -= 1
+                entry["last_used"] = time.time()
+    
+    def unload_idle(self, max_idle=None):
+        """卸載引用計數為零且閒置超過 max_idle 秒的模型，返回被卸載的鍵"""
+        max_idle = self.idle_timeout if max_idle is None else max_idle
+        now = time.time()
+        unloaded = []
+        with self._lock:
+            for key, entry in list(self._entries.items()):
+                if (entry["ready"].is_set() and entry["refs"] == 0
+                        and now - entry["last_used"] >= max_idle):
+                    del self._entries[key]
+                    unloaded.append(key)
+        for key in unloaded:
+            print(f"卸載閒置模型: {key[0]} ({key[2]})")
+        return unloaded
+    
+    def _start_reaper(self):
+        with self._lock:
+            if self._reaper is not None or not self.idle_timeout:
+                return
+            self._reaper = threading.Thread(target=self._reap_loop, daemon=True)
+        self._reaper.start()
+    
+    def _reap_loop(self):
+        while True:
+            time.sleep(max(1.0, min(60.0, self.idle_timeout / 4)))
+            self.unload_idle()
+    
+    def stats(self):
+        now = time.time()
+        with self._lock:
+            return [
+                {
+                    "model": entry["key"][0],
+                    "device": entry["key"][1],
+                    "compute_type": entry["key"][2],
+                    "loaded": entry["model"] is not None,
+                    "refs": entry["refs"],
+                    "load_seconds": round(entry["load_seconds"], 3),
+                    "rss_mb": round(entry["rss_bytes"] / 1024 ** 2, 1),
+                    "idle_seconds": round(now - entry["last_used"], 1) if entry["refs"] == 0 else 0.0
+                }
+                for entry in self._entries.values()
+            ]
+
+MODEL_REGISTRY = ModelRegistry()
+
+def report_progress(segments, duration, progress):
+    """逐段轉發 segments，並按段落結束時間佔音頻長度的比例調用 progress"""
+    for segment in segments:
+        if duration > 0:
+            progress(min(1.0, segment["end"] / duration))
+        yield segment
+    progress(1.0)
+
+def speech_clip_timestamps(audio, regions, vad_filter):
+    """把 [(開始秒, 結束秒)] 區間轉為 model.transcribe 的 clip_timestamps 列表。
+
+    faster-whisper 指定 clip_timestamps 時不執行 VAD，因此 vad_filter 為 True 時在此以相同的 VAD
+    找出語音，只保留區間內的語音部分；沒有需要轉錄的部分時返回空列表。
+    """
+    if vad_filter:
+        speech = [(chunk["start"] / PCM_SAMPLE_RATE, chunk["end"] / PCM_SAMPLE_RATE)
+                  for chunk in get_speech_timestamps(audio)]
+        regions = [(max(start, lo), min(end, hi)) for lo, hi in regions for start, end in speech
+                   if min(end, hi) > max(start, lo)]
+    return [round(t, 3) for region in regions for t in region]
+
+# 批次推理：每個編碼器批次元素最長 30 秒 (Whisper 的窗口)；
+# 每個元素的記憶體估計 (MB，束寬 5 時) 按模型大小，用於在記憶體預算內選擇批次大小
+BATCH_CHUNK_SECONDS = 30
+BATCH_ITEM_MB = {"tiny": 40, "base": 60, "small": 120, "medium": 250, "large": 400}
+MAX_BATCH_SIZE = 32
+
+def adaptive_batch_size(model_name, beam_size=5, memory_budget_mb=None):
+    """在記憶體預算內可同時編碼的片段數；預算為 None 時使用可用記憶體的四分之一"""
+    family = next((name for name in BATCH_ITEM_MB if name in model_name), "large")
+    # 解碼時每個元素保留 beam_size 份狀態，記憶體大致隨束寬增加
+    per_item = BATCH_ITEM_MB[family] * max(beam_size, 1) / 5
+    if memory_budget_mb is None:
+        available = available_memory()
+        memory_budget_mb = available / 4 / 1024 ** 2 if available else 2048
+    return max(1, min(MAX_BATCH_SIZE, int(memory_budget_mb // per_item)))
+
+class AudioTranscriber:
+    def __init__(self, model_name="large-v2", device="cpu", cache=None, compute_type="default",
+                 cpu_threads=0, num_workers=1, beam_size=5, vad_filter=False, model=None,
+                 timing_weight="uniform", segment_cache=None):
+        self.model_name = model_name
+        self.device = device
+        self.cache = cache
+        self.segment_cache = segment_cache
+        self.timing_weight = timing_weight
+        # 完整的有效設定 (未涉及的項目取預設值)，分段進程池的工作進程以此重建轉錄器
+        self.config = dict(
+            DEFAULT_CONFIG,
+            model=model_name,
+            device=device,
+            compute_type=compute_type,
+            cpu_threads=cpu_threads,
+            num_workers=num_workers,
+            beam_size=beam_size,
+            vad_filter=vad_filter,
+            timing_weight=timing_weight,
+            segment_cache=segment_cache is not None
+        )
+        self.transcribe_options = transcribe_options(self.config)
+        self._chunk_executor = None
+        self._chunk_workers = 0
+        self._batched_pipeline = None
+        # 模型由進程內的登記表共享，相同設定的轉錄器不會重複載入；
+        # 傳入 model 時直接使用該對象 (例如基準測試的替身模型)，不經過登記表
+        self._shared_model = model is None
+        self.model = MODEL_REGISTRY.acquire(self.config) if model is None else model
+        
+    def stream_transcription(self, audio_path, start_offset=0.0):
+        """與 model.transcribe 相同，返回 (segments, info)，segments 為逐段產生結果的生成器。
+
+        每一段為包含 start、end、text 與已清理 words 的字典；start_offset 大於 0 時從該秒數開始轉錄。
+        """
+        options = dict(self.transcribe_options)
+        if start_offset > 0 and self.config["vad_filter"]:
+            audio = audio_path
+            if isinstance(audio, str):
+                audio = decode_audio(audio, sampling_rate=PCM_SAMPLE_RATE)
+            duration = len(audio) / PCM_SAMPLE_RATE
+            options["clip_timestamps"] = speech_clip_timestamps(audio, [(start_offset, duration)], True)
+            if not options["clip_timestamps"]:
+                return iter(()), SimpleNamespace(duration=duration, language=None)
+            audio_path = audio
+        elif start_offset > 0:
+            options["clip_timestamps"] = [start_offset]
+        segments, info = self.model.transcribe(audio_path, **options)
+        return self._iter_segments(segments), info
+    
+    @classmethod
+    def from_config(cls, config, cache=None):
+        return cls(
+            config["model"],
+            config["device"],
+            cache,
+            compute_type=config["compute_type"],
+            cpu_threads=config["cpu_threads"],
+            num_workers=config["num_workers"],
+            beam_size=config["beam_size"],
+            vad_filter=config["vad_filter"],
+            timing_weight=config["timing_weight"],
+            segment_cache=shared_segment_cache() if config["segment_cache"] else None
+        )
+    
+    def cached_raw(self, audio_path, **extra):
+        return lookup_cache(self.cache, audio_path, cache_settings(self.config, **extra))
+    
+    def _iter_segments(self, segments):
+        for segment in segments:
+            words = []
+            for word in segment.words:
+                original_word = word.word.strip()
+                cleaned_word = clean_word(original_word)
+                
+                if cleaned_word:
+                    words.append({
+                        "word": cleaned_word,
+                        "original_word": original_word, 
+                        "start": round(word.start, 3),
+                        "end": round(word.end, 3)
+                    })
+            yield {
+                "start": round(segment.start, 3),
+                "end": round(segment.end, 3),
+                "text": segment.text,
+                "words": words
+            }
+        
+    def transcribe_audio(self, audio_path, reference_text=None, progress=None, audio=None, metrics=None):
+        """轉錄音頻；progress 為可選回調，以 0 到 1 之間的完成比例調用。
+
+        audio 為已解碼的 16 kHz 單聲道 float32 數據 (例如 load_pcm 的結果) 時直接用於推理，
+        audio_path 仍用於快取鍵。metrics 為 JobMetrics 時記錄各階段用時與單字數。
+        啟用片段快取時，結果的 cached_fraction 為沿用已轉錄片段的音頻比例。
+        """
+        if not os.path.isfile(audio_path):
+            return {"error": f"找不到文件: {audio_path}"}
+        with timed(metrics, "cache_lookup"):
+            cache_key, cached = self.cached_raw(audio_path)
+        if cached is not None:
+            result = build_result(cached["transcription"], cached["words"], reference_text, metrics,
+                                  self.timing_weight, os.path.abspath(audio_path), cached.get("language"))
+            result["duration"] = cached["duration"]
+            if metrics is not None:
+                metrics.set(duration=cached["duration"], words=len(result["words"]), cache_hit=True)
+            if progress is not None:
+                progress(1.0)
+            return result
+        
+        print("使用 Faster Whisper 進行轉錄...")
+        if audio is None and (metrics is not None or self.segment_cache is not None):
+            # 需要分階段計時時先自行解碼，使解碼時間不計入 prepare；片段快取需要解碼後的數據計算指紋
+            with timed(metrics, "decode"):
+                audio = decode_audio(audio_path, sampling_rate=PCM_SAMPLE_RATE)
+        cached_fraction = None
+        if self.segment_cache is not None:
+            transcription, word_timestamps, cached_fraction, language = self._transcribe_novel(
+                audio_path, audio, progress, metrics)
+            duration = round(len(audio) / PCM_SAMPLE_RATE, 3)
+        else:
+            with timed(metrics, "prepare"):
+                segments, info = self.stream_transcription(audio_path if audio is None else audio)
+            if progress is not None:
+                segments = report_progress(segments, info.duration, progress)
+            with timed(metrics, "inference"):
+                transcription, word_timestamps = collect_segments(segments)
+            duration = round(info.duration, 3)
+            language = info.language
+        
+        if cache_key is not None:
+            with timed(metrics, "cache_write"):
+                self.cache.put(cache_key, transcription, word_timestamps, duration, language)
+        
+        result = build_result(transcription, word_timestamps, reference_text, metrics, self.timing_weight,
+                              os.path.abspath(audio_path), language)
+        result["duration"] = duration
+        if cached_fraction is not None:
+            result["cached_fraction"] = cached_fraction
+        if metrics is not None:
+            metrics.set(duration=duration, asr_words=len(word_timestamps), words=len(result["words"]),
+                        cache_hit=False)
+            if cached_fraction is not None:
+                metrics.set(cached_fraction=cached_fraction)
+            
+        return result
+    
+    def _transcribe_novel(self, audio_path, audio, progress=None, metrics=None):
+        """以片段快取轉錄：與已轉錄音頻相同的片段沿用其單字 (時間按偏移換算)，只對其餘音頻推理。
+
+        返回 (轉錄文本, WordTimeline, 沿用片段佔音頻的比例, 檢測到的語言)；結果隨後加入片段快取。
+        全部沿用而沒有推理時語言為 None。
+        """
+        settings = cache_settings(self.config)
+        duration = len(audio) / PCM_SAMPLE_RATE
+        with timed(metrics, "fingerprint"):
+            fingerprints, flips = audio_fingerprint(audio, FP_WEAK_BITS)
+            matches = self.segment_cache.match(fingerprints, settings, flips)
+            reused = [span for span in map(self.segment_cache.reuse, matches) if span is not None]
+        
+        segments = []
+        novel_regions = []
+        position = 0.0
+        for start, end, cached_segments in reused + [(duration, duration, [])]:
+            if start - position >= FP_MIN_NOVEL_SECONDS:
+                novel_regions.append((position, start))
+            segments.extend(cached_segments)
+            position = end
+        cached_seconds = sum(end - start for start, end, _ in reused)
+        options = dict(self.transcribe_options)
+        language = None
+        if reused:
+            print(f"沿用 {len(reused)} 個已轉錄的片段，共 {cached_seconds:.1f} 秒")
+            options["clip_timestamps"] = speech_clip_timestamps(audio, novel_regions, self.config["vad_filter"])
+        
+        # 沒有沿用任何片段時不指定 clip_timestamps，與一般轉錄完全相同 (包括 faster-whisper 自身的 VAD)
+        if not reused or options["clip_timestamps"]:
+            with timed(metrics, "prepare"):
+                novel, info = self.model.transcribe(audio, **options)
+                novel = self._iter_segments(novel)
+            language = info.language
+            if progress is not None:
+                novel = report_progress(novel, duration, progress)
+            with timed(metrics, "inference"):
+                segments.extend(novel)
+        elif progress is not None:
+            progress(1.0)
+        segments.sort(key=lambda segment: segment["start"])
+        transcription, word_timestamps = collect_segments(segments)
+        
+        with timed(metrics, "segment_cache_write"):
+            self.segment_cache.put(audio_path, settings, fingerprints, word_timestamps, round(duration, 3))
+        return (transcription, word_timestamps, round(cached_seconds / duration, 4) if duration else 0.0,
+                language)
+    
+    def transcribe_batch(self, clips, reference_texts=None, batch_size=None, memory_budget_mb=None, progress=None):
+        """以批次推理轉錄多個短片段，返回與 clips 順序相同、格式與 transcribe_audio 相同的結果列表。
+
+        clips 的元素為音頻路徑或已解碼的 16 kHz 單聲道 float32 數據。每組片段首尾相接成一條音頻，
+        每個片段 (超過 30 秒時按 30 秒切開) 作為 BatchedInferencePipeline 的一個 clip_timestamps 區間，
+        一次調用編碼一整批；時間戳換算為相對各片段的開頭。batch_size 為 None 時按記憶體預算選擇。
+        同一組片段共用一次語言檢測，適合同一語言的短片段；長音頻請使用 transcribe_audio。
+        """
+        if batch_size is None:
+            batch_size = adaptive_batch_size(self.model_name, self.config["beam_size"], memory_budget_mb)
+        reference_texts = reference_texts or [None] * len(clips)
+        results = [None] * len(clips)
+        pending = []
+        for index, clip in enumerate(clips):
+            cache_key = None
+            if isinstance(clip, str):
+                if not os.path.isfile(clip):
+                    results[index] = {"error": f"找不到文件: {clip}"}
+                    continue
+                # 批次推理不以前文作為提示，結果與逐個轉錄不同，快取鍵分開
+                cache_key, cached = self.cached_raw(clip, batched=True)
+                if cached is not None:
+                    results[index] = self._clip_result(clip, cached["transcription"], cached["words"],
+                                                       cached["duration"], reference_texts[index],
+                                                       cached.get("language"))
+                    continue
+            pending.append((index, cache_key))
+        
+        done = len(clips) - len(pending)
+        if progress is not None:
+            progress(done / len(clips) if clips else 1.0)
+        groups = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+        if groups and self._batched_pipeline is None:
+            self._batched_pipeline = BatchedInferencePipeline(model=self.model)
+        # 下一組片段在背景解碼，與當前一組的推理重疊
+        with ThreadPoolExecutor(max_workers=1) as decoder:
+            future = decoder.submit(self._decode_clips, clips, groups[0]) if groups else None
+            for number, group in enumerate(groups):
+                decoded = future.result()
+                if number + 1 < len(groups):
+                    future = decoder.submit(self._decode_clips, clips, groups[number + 1])
+                for index, cache_key, audio, error in decoded:
+                    if error is not None:
+                        results[index] = {"error": error}
+                decoded = [item for item in decoded if item[3] is None]
+                for (index, cache_key, audio, _), (transcription, words, language) in zip(
+                        decoded, self._transcribe_group([item[2] for item in decoded], batch_size)):
+                    duration = round(len(audio) / PCM_SAMPLE_RATE, 3)
+                    if cache_key is not None:
+                        self.cache.put(cache_key, transcription, words, duration, language)
+                    results[index] = self._clip_result(clips[index], transcription, words, duration,
+                                                       reference_texts[index], language)
+                done += len(group)
+                if progress is not None:
+                    progress(done / len(clips))
+        return results
+    
+    @staticmethod
+    def _decode_clips(clips, group):
+        """解碼一組片段，返回 (下標, 快取鍵, 音頻, 錯誤訊息) 列表"""
+        decoded = []
+        for index, cache_key in group:
+            clip = clips[index]
+            try:
+                audio = decode_audio(clip, sampling_rate=PCM_SAMPLE_RATE) if isinstance(clip, str) else clip
+                decoded.append((index, cache_key, np.asarray(audio, dtype=np.float32), None))
+            except Exception as e:
+                decoded.append((index, cache_key, None, f"解碼失敗: {e}"))
+        return decoded
+    
+    def _transcribe_group(self, audios, batch_size):
+        """把一組已解碼的片段接成一條音頻做批次推理，返回每個片段的 (轉錄文本, WordTimeline, 語言)；
+        同一組共用一次語言檢測"""
+        chunk_samples = BATCH_CHUNK_SECONDS * PCM_SAMPLE_RATE
+        # 每個片段補齊到整毫秒，時間戳四捨五入到毫秒後仍能準確判斷所屬片段
+        ms_samples = PCM_SAMPLE_RATE // 1000
+        buffers, clip_timestamps, offsets = [], [], []
+        position = 0
+        for audio in audios:
+            offsets.append(position / PCM_SAMPLE_RATE)
+            for start in range(0, len(audio), chunk_samples):
+                end = min(len(audio), start + chunk_samples)
+                clip_timestamps.append({"start": (position + start) / PCM_SAMPLE_RATE,
+                                        "end": (position + end) / PCM_SAMPLE_RATE})
+            padded = -(-len(audio) // ms_samples) * ms_samples
+            buffers.append(audio)
+            buffers.append(np.zeros(padded - len(audio), dtype=np.float32))
+            position += padded
+        
+        per_clip = [[] for _ in audios]
+        language = None
+        if clip_timestamps:
+            segments, info = self._batched_pipeline.transcribe(
+                np.concatenate(buffers), clip_timestamps=clip_timestamps, batch_size=batch_size,
+                **self.transcribe_options)
+            starts = np.array(offsets)
+            for segment in self._iter_segments(segments):
+                slot = int(np.searchsorted(starts, segment["start"] + 0.0005, side="right")) - 1
+                offset = offsets[slot]
+                segment["start"] = round(segment["start"] - offset, 3)
+                segment["end"] = round(segment["end"] - offset, 3)
+                for word in segment["words"]:
+                    word["start"] = round(word["start"] - offset, 3)
+                    word["end"] = round(word["end"] - offset, 3)
+                per_clip[slot].append(segment)
+            language = info.language
+        return [collect_segments(segments) + (language,) for segments in per_clip]
+    
+    def _clip_result(self, clip, transcription, words, duration, reference_text, language=None):
+        alignment_key = os.path.abspath(clip) if isinstance(clip, str) else None
+        result = build_result(transcription, words, reference_text, weighting=self.timing_weight,
+                              alignment_key=alignment_key, language=language)
+        result["duration"] = duration
+        return result
+    
+    def transcribe_audio_chunked(self, audio_path, reference_text=None, chunk_length=600.0, overlap=5.0, workers=None):
+        """分段並行模式：在靜音處切分音頻，由 workers 個進程同時轉錄後合併"""
+        if not os.path.isfile(audio_path):
+            return {"error": f"找不到文件: {audio_path}"}
+        workers = workers or max(1, (os.cpu_count() or 1) // 4)
+        if self._chunk_executor is None or self._chunk_workers != workers:
+            self._shutdown_chunk_executor()
+            # 進程池在多次調用之間保留，避免每次重新載入模型；
+            # 工作進程只轉錄切分後的分段，不需要載入片段快取的指紋索引
+            self._chunk_executor = ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_init_pool_worker,
+                initargs=(dict(self.config, segment_cache=False),)
+            )
+            self._chunk_workers = workers
+        
+        cache_key, raw = self.cached_raw(audio_path, chunk_length=chunk_length, overlap=overlap)
+        if raw is None:
+            raw = transcribe_chunked(audio_path, self._chunk_executor, chunk_length, overlap)
+            if cache_key is not None:
+                self.cache.put(cache_key, raw["transcription"], raw["words"], raw["duration"], raw["language"])
+        result = build_result(raw["transcription"], raw["words"], reference_text, weighting=self.timing_weight,
+                              language=raw.get("language"))
+        result["duration"] = raw["duration"]
+        return result
+    
+    def _shutdown_chunk_executor(self):
+        if self._chunk_executor is not None:
+            self._chunk_executor.shutdown()
+            self._chunk_executor = None
+            self._chunk_workers = 0
+    
+    def close(self):
+        """關閉分段進程池並釋放對共享模型的引用"""
+        self._shutdown_chunk_executor()
+        self._batched_pipeline = None
+        if self.model is not None:
+            self.model = None
+            if self._shared_model:
+                MODEL_REGISTRY.release(self.config)
+    
+    def correct_transcription(self, transcription, reference_text, word_timestamps):
+        return correct_transcription(transcription, reference_text, word_timestamps, self.timing_weight)
+
+def format_timestamp(seconds):
+    hours = int(seconds // 3600)
+    minutes = int((seconds % 3600) // 60)
+    seconds = seconds % 60
+    return f"{hours:02d}:{minutes:02d}:{seconds:06.3f}"
+
+def output_paths(audio_path):
+    base = os.path.splitext(audio_path)[0]
+    return f"{base}_transcription.txt", f"{base}_transcription.json"
+
+def export_path(audio_path, fmt):
+    return os.path.splitext(audio_path)[0] + "_transcription" + EXPORTERS[fmt].suffix
+
+def outputs_up_to_date(audio_path, formats=None):
+    """所選格式的輸出均存在且不舊於音頻文件時返回 True"""
+    audio_mtime = os.path.getmtime(audio_path)
+    for fmt in formats or DEFAULT_CONFIG["export_formats"]:
+        path = export_path(audio_path, fmt)
+        if not os.path.isfile(path) or os.path.getmtime(path) < audio_mtime:
+            return False
+    return True
+
+class Exporter:
+    """導出格式的基類。
+
+    begin 打開臨時文件，之後每個單字調用一次 write，end 完成後替換為正式文件；
+    出錯時調用 abort 刪除臨時文件。子類通過 EXPORTERS 註冊格式名稱。
+    """
+    suffix = None
+    
+    def __init__(self, path, config):
+        self.path = path
+        # 每個寫入者使用自己的臨時文件，同時導出同一輸出時不會互相覆蓋
+        self.temp_path = temp_path_for(path)
+        self.config = config
+        self.file = None
+    
+    def open(self):
+        return open(self.temp_path, 'w', encoding='utf-8')
+    
+    def begin(self, header, text_parts):
+        self.file = self.open()
+    
+    def write(self, item, segment):
+        raise NotImplementedError
+    
+    def end(self):
+        self.file.close()
+        os.replace(self.temp_path, self.path)
+    
+    def abort(self):
+        if self.file is not None:
+            self.file.close()
+        if os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+
+class TxtExporter(Exporter):
+    suffix = ".txt"
+    
+    def begin(self, header, text_parts):
+        super().begin(header, text_parts)
+        self.file.write(f"{header}\n\n")
+        for part in text_parts:
+            self.file.write(part)
+        self.file.write("\n\n== 單字時間戳 (已移除非文字字符) ==\n\n")
+    
+    def write(self, item, segment):
+        self.file.write(f"{format_timestamp(item['start'])} --> {format_timestamp(item['end'])}: {item['word']}\n")
+
+class JsonExporter(Exporter):
+    """輸出與 json.dump({"words": [...]}, indent=2) 相同"""
+    suffix = ".json"
+    
+    def begin(self, header, text_parts):
+        super().begin(header, text_parts)
+        self.file.write('{\n  "words": [')
+        self.separator = "\n"
+        self.encoded = {}
+    
+    def encode(self, word):
+        # 同一單字反覆出現，緩存其 JSON 編碼
+        encoded = self.encoded.get(word)
+        if encoded is None:
+            encoded = self.encoded[word] = json.dumps(word)
+        return encoded
+    
+    def write(self, item, segment):
+        # 時間戳均為 float，repr 與 json.dumps 的結果相同
+        self.file.write(f'{self.separator}    {{\n      "word": {self.encode(item["word"])},\n'
+                        f'      "start": {item["start"]!r},\n      "end": {item["end"]!r}\n    }}')
+        self.separator = ",\n"
+    
+    def end(self):
+        self.file.write("]\n}" if self.separator == "\n" else "\n  ]\n}")
+        super().end()
+
+class GzipJsonExporter(JsonExporter):
+    """與 JSON 輸出內容相同，但不縮排並以 gzip 壓縮，用於歸檔"""
+    suffix = ".json.gz"
+    
+    def open(self):
+        return gzip.open(self.temp_path, 'wt', encoding='utf-8', compresslevel=6)
+    
+    def begin(self, header, text_parts):
+        Exporter.begin(self, header, text_parts)
+        self.file.write('{"words":[')
+        self.separator = ""
+        self.encoded = {}
+    
+    def write(self, item, segment):
+        self.file.write(f'{self.separator}{{"word":{self.encode(item["word"])},'
+                        f'"start":{item["start"]!r},"end":{item["end"]!r}}}')
+        self.separator = ","
+    
+    def end(self):
+        self.file.write("]}")
+        Exporter.end(self)
+
+class BinaryExporter(Exporter):
+    """WordTimeline 二進位格式；各欄位先收集為列表，在 end 時一次寫出"""
+    suffix = ".wtl"
+    
+    def begin(self, header, text_parts):
+        self.words, self.starts, self.ends, self.original_words, self.segments = [], [], [], [], []
+    
+    def write(self, item, segment):
+        self.words.append(item["word"])
+        self.starts.append(item["start"])
+        self.ends.append(item["end"])
+        self.original_words.append(item.get("original_word"))
+        self.segments.append(segment)
+    
+    def end(self):
+        timeline = WordTimeline(self.words, self.starts, self.ends, self.original_words, self.segments)
+        with open(self.temp_path, 'wb') as f:
+            f.write(timeline.to_bytes())
+        os.replace(self.temp_path, self.path)
+
+class SubtitleExporter(Exporter):
+    """把單字合併為字幕條目：遇到新段落 (subtitle_by_segment)、
+    超過 subtitle_max_chars 個字符或 subtitle_max_duration 秒時開始新條目"""
+    
+    def begin(self, header, text_parts):
+        super().begin(header, text_parts)
+        self.max_chars = self.config["subtitle_max_chars"]
+        self.max_duration = self.config["subtitle_max_duration"]
+        self.by_segment = self.config["subtitle_by_segment"]
+        self.cue_count = 0
+        self.cue_words = []
+        self.cue_length = 0
+    
+    def write(self, item, segment):
+        text = item.get("original_word") or item["word"]
+        if self.cue_words:
+            if (self.by_segment and segment >= 0 and segment != self.cue_segment
+                    or self.cue_length + 1 + len(text) > self.max_chars
+                    or item["end"] - self.cue_start > self.max_duration):
+                self.flush()
+        if not self.cue_words:
+            self.cue_start = item["start"]
+            self.cue_segment = segment
+            self.cue_length = -1
+        self.cue_words.append(text)
+        self.cue_length += 1 + len(text)
+        self.cue_end = item["end"]
+    
+    def flush(self):
+        self.cue_count += 1
+        self.write_cue(self.cue_count, self.cue_start, self.cue_end, " ".join(self.cue_words))
+        self.cue_words = []
+    
+    def end(self):
+        if self.cue_words:
+            self.flush()
+        super().end()
+
+class SrtExporter(SubtitleExporter):
+    suffix = ".srt"
+    
+    def write_cue(self, number, start, end, text):
+        self.file.write(f"{number}\n{format_timestamp(start).replace('.', ',')} --> "
+                        f"{format_timestamp(end).replace('.', ',')}\n{text}\n\n")
+
+class VttExporter(SubtitleExporter):
+    suffix = ".vtt"
+    
+    def begin(self, header, text_parts):
+        super().begin(header, text_parts)
+        self.file.write("WEBVTT\n\n")
+    
+    def write_cue(self, number, start, end, text):
+        self.file.write(f"{format_timestamp(start)} --> {format_timestamp(end)}\n{text}\n\n")
+
+EXPORTERS = {
+    "txt": TxtExporter,
+    "json": JsonExporter,
+    "srt": SrtExporter,
+    "vtt": VttExporter,
+    "json.gz": GzipJsonExporter,
+    "wtl": BinaryExporter
+}
+
+def _iter_words_with_segments(words):
+    if isinstance(words, WordTimeline):
+        return zip(words, words.segment_ids.tolist())
+    return ((item, item.get("segment", -1)) for item in words)
+
+def export_results(audio_path, header, text_parts, words, config=None):
+    """在一次遍歷單字的過程中寫出 config["export_formats"] 中的所有格式，返回文件路徑列表"""
+    config = config or DEFAULT_CONFIG
+    formats = config["export_formats"]
+    unknown = [fmt for fmt in formats if fmt not in EXPORTERS]
+    if unknown:
+        raise ValueError(f"未知的導出格式: {', '.join(unknown)}")
+    
+    exporters = [EXPORTERS[fmt](export_path(audio_path, fmt), config) for fmt in formats]
+    try:
+        for exporter in exporters:
+            exporter.begin(header, text_parts)
+        for item, segment in _iter_words_with_segments(words):
+            for exporter in exporters:
+                exporter.write(item, segment)
+        for exporter in exporters:
+            exporter.end()
+    except BaseException:
+        for exporter in exporters:
+            exporter.abort()
+        raise
+    return [exporter.path for exporter in exporters]
+
+def save_results(result, audio_path, config=None):
+    """按設定中的導出格式保存轉錄結果，返回文件路徑列表"""
+    if "corrected_transcription" in result:
+        header = "== 修正後的轉錄 =="
+        text = result["corrected_transcription"]
+    else:
+        header = "== 轉錄 =="
+        text = result["transcription"]
+    
+    return export_results(audio_path, header, [text], result["words"], config)
+
+def parse_timestamp(value):
+    """把 HH:MM:SS(.mmm)、MM:SS 或秒數字串轉為秒"""
+    seconds = 0.0
+    for part in str(value).split(":"):
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+class TranscriptIndex:
+    """已保存轉錄結果的查詢索引，保存在 JSON 旁的 .idx.npz 文件中。
+
+    單字按開始時間排序並記錄結束時間的累積最大值，用於時間範圍查詢；
+    倒排索引把每個小寫單字映射到其所有位置，用於單字與詞組查詢。
+    """
+    VERSION = 1
+    
+    def __init__(self, timeline, lower_ids, lower_table, postings, posting_offsets):
+        self.timeline = timeline
+        self.lower_ids = lower_ids
+        self.lower_table = lower_table
+        self.lower_index = {word: i for i, word in enumerate(lower_table)}
+        self.postings = postings
+        self.posting_offsets = posting_offsets
+    
+    @staticmethod
+    def index_path(json_path):
+        return os.path.splitext(json_path)[0] + ".idx.npz"
+    
+    @classmethod
+    def build(cls, json_path):
+        with open(json_path, 'r', encoding='utf-8') as f:
+            timeline = WordTimeline.from_dicts(json.load(f)["words"]).sorted_by_start()
+        
+        lower_table = []
+        lower_index = {}
+        table_to_lower = np.empty(len(timeline.table), dtype=np.int32)
+        for i, word in enumerate(timeline.table):
+            key = word.lower()
+            table_to_lower[i] = lower_index.setdefault(key, len(lower_table))
+            if table_to_lower[i] == len(lower_table):
+                lower_table.append(key)
+        lower_ids = table_to_lower[timeline.word_ids] if len(timeline) else np.empty(0, dtype=np.int32)
+        
+        # 倒排索引以 CSR 形式保存：postings 按單字分組的位置，posting_offsets 為每組的起點
+        postings = np.argsort(lower_ids, kind="stable").astype(np.int32)
+        counts = np.bincount(lower_ids, minlength=len(lower_table))
+        posting_offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        return cls(timeline, lower_ids, lower_table, postings, posting_offsets)
+    
+    def save(self, path, source_path):
+        stat = os.stat(source_path)
+        timeline = self.timeline
+        with open(path + ".tmp", 'wb') as f:
+            np.savez(
+                f,
+                version=np.int32(self.VERSION),
+                source_mtime=np.float64(stat.st_mtime),
+                source_size=np.int64(stat.st_size),
+                table=np.array(timeline.table, dtype=np.str_),
+                word_ids=timeline.word_ids,
+                starts=timeline.starts,
+                ends=timeline.ends,
+                lower_ids=self.lower_ids,
+                lower_table=np.array(self.lower_table, dtype=np.str_),
+                postings=self.postings,
+                posting_offsets=self.posting_offsets
+            )
+        os.replace(path + ".tmp", path)
+    
+    @classmethod
+    def load(cls, path, source_path=None):
+        """讀取索引；提供 source_path 且源文件已改變時返回 None"""
+        with np.load(path) as data:
+            if int(data["version"]) != cls.VERSION:
+                return None
+            if source_path is not None:
+                stat = os.stat(source_path)
+                if float(data["source_mtime"]) != stat.st_mtime or int(data["source_size"]) != stat.st_size:
+                    return None
+            count = len(data["word_ids"])
+            timeline = WordTimeline._from_arrays(
+                data["table"].tolist(),
+                data["word_ids"],
+                data["starts"],
+                data["ends"],
+                np.full(count, -1, dtype=np.int32),
+                np.full(count, -1, dtype=np.int32)
+            )
+            return cls(timeline, data["lower_ids"], data["lower_table"].tolist(),
+                       data["postings"], data["posting_offsets"])
+    
+    @classmethod
+    def open(cls, json_path):
+        """打開 JSON 對應的索引，不存在或已過期時重新建立並保存"""
+        path = cls.index_path(json_path)
+        if os.path.isfile(path):
+            try:
+                index = cls.load(path, json_path)
+            except (OSError, ValueError, KeyError):
+                index = None
+            if index is not None:
+                return index
+        index = cls.build(json_path)
+        index.save(path, json_path)
+        return index
+    
+    def range(self, start, end):
+        """與 [start, end) 重疊的所有單字"""
+        return self.timeline.slice_time(start, end, overlap=True)
+    
+    def positions(self, word):
+        lower_id = self.lower_index.get(clean_word(word).lower())
+        if lower_id is None:
+            return np.empty(0, dtype=np.int32)
+        return self.postings[self.posting_offsets[lower_id]:self.posting_offsets[lower_id + 1]]
+    
+    def find(self, phrase):
+        """查找單字或連續詞組，返回 (開始時間, 結束時間, 起始位置) 列表"""
+        tokens = [clean_word(token).lower() for token in phrase.split()]
+        tokens = [token for token in tokens if token]
+        if not tokens:
+            return []
+        
+        candidates = self.positions(tokens[0])
+        for k, token in enumerate(tokens[1:], 1):
+            lower_id = self.lower_index.get(token)
+            if lower_id is None:
+                return []
+            candidates = candidates[candidates + k < len(self.lower_ids)]
+            candidates = candidates[self.lower_ids[candidates + k] == lower_id]
+        
+        last = candidates + len(tokens) - 1
+        return list(zip(self.timeline.starts[candidates].tolist(),
+                        self.timeline.ends[last].tolist(),
+                        candidates.tolist()))
+
+def run_query(path, time_range=None, phrase=None, context=3):
+    """在已保存的轉錄上執行時間範圍或單字查詢並打印結果"""
+    if not path.endswith(".json"):
+        path = output_paths(path)[1]
+    start_time = time.perf_counter()
+    index = TranscriptIndex.open(path)
+    open_time = time.perf_counter() - start_time
+    
+    if time_range is not None:
+        start_time = time.perf_counter()
+        words = index.range(parse_timestamp(time_range[0]), parse_timestamp(time_range[1]))
+        query_time = time.perf_counter() - start_time
+        for item in words:
+            print(f"{format_timestamp(item['start'])} --> {format_timestamp(item['end'])}: {item['word']}")
+        print(f"共 {len(words)} 個單字，索引載入 {open_time * 1000:.1f} 毫秒，查詢 {query_time * 1000:.2f} 毫秒")
+    
+    if phrase is not None:
+        start_time = time.perf_counter()
+        matches = index.find(phrase)
+        query_time = time.perf_counter() - start_time
+        words = index.timeline.words()
+        length = len(phrase.split())
+        for start, end, position in matches:
+            before = " ".join(words[max(0, position - context):position])
+            after = " ".join(words[position + length:position + length + context])
+            matched = " ".join(words[position:position + length])
+            print(f"{format_timestamp(start)} --> {format_timestamp(end)}: {before} [{matched}] {after}".rstrip())
+        print(f"共 {len(matches)} 處，索引載入 {open_time * 1000:.1f} 毫秒，查詢 {query_time * 1000:.2f} 毫秒")
+
+class StreamingResultWriter:
+    """將轉錄段落逐段追加到 JSON Lines 部分文件，完成後再生成最終的 TXT 與 JSON。
+
+    中斷後部分文件會保留，重新打開時丟棄最後一行不完整的記錄，
+    resume_offset 給出可以繼續轉錄的秒數。
+    """
+    def __init__(self, audio_path):
+        self.audio_path = audio_path
+        self.partial_file = f"{os.path.splitext(audio_path)[0]}_transcription.partial.jsonl"
+        self.resume_offset = 0.0
+        self.segment_count = 0
+        self.word_count = 0
+        
+        valid_bytes = 0
+        if os.path.isfile(self.partial_file):
+            with open(self.partial_file, 'rb') as f:
+                for line in f:
+                    try:
+                        segment = json.loads(line)
+                    except ValueError:
+                        break
+                    if not line.endswith(b"\n"):
+                        break
+                    valid_bytes += len(line)
+                    self.resume_offset = segment["end"]
+                    self.segment_count += 1
+                    self.word_count += len(segment["words"])
+            if self.segment_count:
+                print(f"發現未完成的轉錄，從 {format_timestamp(self.resume_offset)} 繼續")
+        
+        self._file = open(self.partial_file, 'ab')
+        self._file.truncate(valid_bytes)
+    
+    def write_segment(self, segment):
+        self._file.write(json.dumps(segment, ensure_ascii=False).encode('utf-8') + b"\n")
+        self._file.flush()
+        self.segment_count += 1
+        self.word_count += len(segment["words"])
+    
+    def iter_segments(self):
+        if not self._file.closed:
+            self._file.flush()
+        with open(self.partial_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                yield json.loads(line)
+    
+    def iter_words(self):
+        for segment in self.iter_segments():
+            yield from segment["words"]
+    
+    def transcription(self):
+        return " ".join(segment["text"] for segment in self.iter_segments()).strip()
+    
+    def finalize(self, result=None, config=None):
+        """生成最終輸出並刪除部分文件；result 為修正後的結果時直接保存它"""
+        self.close()
+        if result is not None:
+            paths = save_results(result, self.audio_path, config)
+        else:
+            text_parts = ((" " if i else "") + segment["text"].strip()
+                          for i, segment in enumerate(self.iter_segments()))
+            words = (dict(word, segment=i)
+                     for i, segment in enumerate(self.iter_segments()) for word in segment["words"])
+            paths = export_results(self.audio_path, "== 轉錄 ==", text_parts, words, config)
+        os.remove(self.partial_file)
+        return paths
+    
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+def stream_transcribe_to_files(transcriber, audio_path, reference_text=None, config=None, audio=None,
+                               metrics=None):
+    """邊轉錄邊寫入部分文件，記憶體佔用與音頻長度無關；有參考文本時在結束後修正。
+
+    audio 為已解碼的數據時直接用於推理，不再重新解碼 audio_path；metrics 為 JobMetrics 時記錄各階段用時。
+    啟用片段快取時需要整個音頻的指紋，改為完整轉錄後一次寫出。
+    """
+    if transcriber.segment_cache is not None:
+        result = transcriber.transcribe_audio(audio_path, reference_text, audio=audio, metrics=metrics)
+        if "error" in result:
+            raise FileNotFoundError(result["error"])
+        with timed(metrics, "output"):
+            output_files = save_results(result, audio_path, config)
+        # 只有實際推理 (未命中完整結果的快取) 時才有 cached_fraction
+        return {
+            "duration": result["duration"],
+            "words": len(result["words"]),
+            "output_files": output_files,
+            "cache_hit": "cached_fraction" not in result,
+            "cached_fraction": result.get("cached_fraction")
+        }
+    with timed(metrics, "cache_lookup"):
+        cache_key, cached = transcriber.cached_raw(audio_path)
+    if cached is not None:
+        result = build_result(cached["transcription"], cached["words"], reference_text, metrics,
+                              transcriber.timing_weight, language=cached.get("language"))
+        with timed(metrics, "output"):
+            output_files = save_results(result, audio_path, config)
+        summary = {
+            "duration": cached["duration"],
+            "words": len(result["words"]),
+            "output_files": output_files,
+            "cache_hit": True
+        }
+    else:
+        writer = StreamingResultWriter(audio_path)
+        try:
+            if audio is None and metrics is not None:
+                with metrics.stage("decode"):
+                    audio = decode_audio(audio_path, sampling_rate=PCM_SAMPLE_RATE)
+            source = audio_path if audio is None else audio
+            with timed(metrics, "prepare"):
+                segments, info = transcriber.stream_transcription(source, writer.resume_offset)
+            with timed(metrics, "inference"):
+                for segment in segments:
+                    writer.write_segment(segment)
+        finally:
+            writer.close()
+        
+        if cache_key is not None:
+            with timed(metrics, "cache_write"):
+                transcriber.cache.put(cache_key, writer.transcription(), writer.iter_words(),
+                                      round(info.duration, 3), info.language)
+        
+        result = None
+        if reference_text:
+            transcription, word_timestamps = collect_segments(writer.iter_segments())
+            result = build_result(transcription, word_timestamps, reference_text, metrics,
+                                  transcriber.timing_weight, language=info.language)
+        with timed(metrics, "output"):
+            output_files = writer.finalize(result, config)
+        summary = {
+            "duration": round(info.duration, 3),
+            "words": writer.word_count if result is None else len(result["words"]),
+            "output_files": output_files,
+            "cache_hit": False
+        }
+        if metrics is not None:
+            metrics.set(asr_words=writer.word_count)
+    if metrics is not None:
+        metrics.set(duration=summary["duration"], words=summary["words"], cache_hit=summary["cache_hit"])
+    return summary
+
+# 預解碼：在背景線程中把後續文件解碼為 16 kHz 單聲道 float32 PCM，與當前文件的推理重疊
+PCM_SAMPLE_RATE = 16000
+DEFAULT_PREFETCH_BYTES = 1024 ** 3
+
+def pcm_cache_path(audio_path, pcm_dir):
+    """PCM 文件路徑，以音頻的絕對路徑、大小與修改時間為鍵"""
+    return os.path.join(pcm_dir, file_key(audio_path) + ".npy")
+
+def decode_to_pcm(audio_path, pcm_dir):
+    """解碼並重採樣為 .npy 文件 (與 faster-whisper 內部的解碼相同)，已存在時直接返回其路徑"""
+    path = pcm_cache_path(audio_path, pcm_dir)
+    if not os.path.isfile(path):
+        audio = decode_audio(audio_path, sampling_rate=PCM_SAMPLE_RATE)
+        temp_path = temp_path_for(path)
+        with open(temp_path, 'wb') as f:
+            np.save(f, audio)
+        os.replace(temp_path, path)
+    return path
+
+def load_pcm(pcm_path):
+    # 寫時複製的記憶體映射：多個進程共用頁面緩存，對數組的修改不會寫回文件
+    return np.load(pcm_path, mmap_mode="c")
+
+class AudioPrefetcher:
+    """在背景線程池中按順序提前解碼音頻文件，迭代時按輸入順序產生已解碼的條目。
+
+    每個條目為 {"audio_path", "pcm_path", "bytes", "decode_seconds"}，解碼失敗時以 "error" 代替 pcm_path。
+    調用者用完條目後必須調用 release：已解碼或正在解碼但尚未釋放的文件最多 depth 個，
+    已解碼數據總量達到 max_bytes 時暫停提交新的解碼 (已提交的解碼仍會完成)。
+    keep 為 False 時 release 會刪除 PCM 文件。
+    """
+    def __init__(self, audio_paths, pcm_dir, depth=2, max_bytes=DEFAULT_PREFETCH_BYTES,
+                 decode_workers=2, keep=False):
+        self.audio_paths = list(audio_paths)
+        self.pcm_dir = pcm_dir
+        self.depth = max(1, depth)
+        self.max_bytes = max_bytes
+        self.decode_workers = max(1, decode_workers)
+        self.keep = keep
+        self.condition = threading.Condition()
+        self.outstanding = 0
+        self.held_bytes = 0
+        self.peak_bytes = 0
+        self.decoded = 0
+        self.decode_seconds = 0.0
+        self.wait_seconds = 0.0
+        os.makedirs(pcm_dir, exist_ok=True)
+    
+    def _decode(self, audio_path):
+        start_time = time.perf_counter()
+        item = {"audio_path": audio_path, "bytes": 0}
+        try:
+            item["pcm_path"] = decode_to_pcm(audio_path, self.pcm_dir)
+            item["bytes"] = os.path.getsize(item["pcm_path"])
+        except Exception as e:
+            item["error"] = str(e)
+        item["decode_seconds"] = time.perf_counter() - start_time
+        with self.condition:
+            self.decoded += 1
+            self.decode_seconds += item["decode_seconds"]
+            self.held_bytes += item["bytes"]
+            self.peak_bytes = max(self.peak_bytes, self.held_bytes)
+        return item
+    
+    def _can_submit(self):
+        return self.outstanding < self.depth and self.held_bytes < self.max_bytes
+    
+    def __iter__(self):
+        executor = ThreadPoolExecutor(max_workers=self.decode_workers)
+        futures = deque()
+        next_index = 0
+        try:
+            while next_index < len(self.audio_paths) or futures:
+                with self.condition:
+                    if not futures:
+                        # 預算已用完，等待調用者釋放條目
+                        self.condition.wait_for(self._can_submit)
+                    while next_index < len(self.audio_paths) and self._can_submit():
+                        futures.append(executor.submit(self._decode, self.audio_paths[next_index]))
+                        next_index += 1
+                        self.outstanding += 1
+                start_time = time.perf_counter()
+                item = futures.popleft().result()
+                self.wait_seconds += time.perf_counter() - start_time
+                yield item
+        finally:
+            for future in futures:
+                future.cancel()
+            executor.shutdown()
+            for future in futures:
+                if not future.cancelled():
+                    self.release(future.result())
+    
+    def release(self, item):
+        """釋放條目佔用的預算，可以從任意線程調用，重複調用無效"""
+        with self.condition:
+            if item.get("released"):
+                return
+            item["released"] = True
+            self.outstanding -= 1
+            self.held_bytes -= item["bytes"]
+            self.condition.notify_all()
+        if not self.keep and "pcm_path" in item:
+            try:
+                os.remove(item["pcm_path"])
+            except OSError:
+                pass
+    
+    def stats(self):
+        with self.condition:
+            return {
+                "files": self.decoded,
+                "decode_seconds": round(self.decode_seconds, 3),
+                "wait_seconds": round(self.wait_seconds, 3),
+                "peak_mb": round(self.peak_bytes / 1024 ** 2, 1),
+                "max_mb": round(self.max_bytes / 1024 ** 2, 1)
+            }
+
+# 音頻指紋 (Haitsma–Kalker)：每 FP_HOP 個取樣一幀，300–2000 Hz 按對數間隔分為 33 個頻帶，
+# 相鄰頻帶能量差在相鄰兩幀之間的變化符號組成每幀一個 32 位子指紋
+FP_FRAME = 2048
+FP_HOP = 512
+FP_BANDS = 33
+FP_BLOCK = 4096
+# 匹配：至少 FP_MIN_VOTES 個子指紋完全相同的 (條目, 偏移) 才逐幀驗證，只驗證票數最多的 FP_MAX_CANDIDATES 個；
+# 在 FP_WINDOW 幀的滑動窗口內誤碼率低於 FP_MAX_BER 視為相同音頻，相同部分至少 FP_MIN_MATCH_SECONDS 秒才沿用
+FP_MAX_POSTINGS = 64
+# 查詢時除原子指紋外，再以翻轉最不可靠 (能量差最接近零) 的 FP_WEAK_BITS 個位之一的子指紋查找
+FP_WEAK_BITS = 6
+FP_MIN_VOTES = 4
+FP_MAX_CANDIDATES = 32
+FP_WINDOW = 64
+FP_MAX_BER = 0.3
+FP_MIN_MATCH_SECONDS = 8.0
+# 匹配區間兩端各留出的秒數 (邊界附近的單字重新推理)；短於 FP_MIN_NOVEL_SECONDS 的未匹配間隙不做推理
+FP_MARGIN_SECONDS = 1.0
+FP_MIN_NOVEL_SECONDS = 0.5
+
+DEFAULT_SEGMENT_CACHE_DIR = os.path.join(DEFAULT_CACHE_DIR, "segments")
+DEFAULT_SEGMENT_CACHE_SIZE = 256 * 1024 ** 2
+
+def audio_fingerprint(audio, weak_bits=0):
+    """16 kHz 單聲道音頻的子指紋序列 (uint32)，第 k 個子指紋描述從 k * FP_HOP 個取樣開始的兩幀。
+
+    weak_bits 大於 0 時返回 (子指紋, 翻轉遮罩)，翻轉遮罩為 (幀數, weak_bits) 的 uint32 陣列，
+    每個元素只有一個最不可靠的位為 1。
+    """
+    audio = np.asarray(audio, dtype=np.float32)
+    if len(audio) < FP_FRAME + FP_HOP:
+        empty = np.empty(0, dtype=np.uint32)
+        return (empty, np.empty((0, weak_bits), dtype=np.uint32)) if weak_bits else empty
+    frames = np.lib.stride_tricks.sliding_window_view(audio, FP_FRAME)[::FP_HOP]
+    window = np.hanning(FP_FRAME).astype(np.float32)
+    edges = np.round(np.geomspace(300, 2000, FP_BANDS + 1) * FP_FRAME / PCM_SAMPLE_RATE).astype(int)
+    lo, hi = edges[0], edges[-1]
+    energies = np.empty((len(frames), FP_BANDS), dtype=np.float32)
+    # 分塊計算頻譜，記憶體佔用與音頻長度無關
+    for start in range(0, len(frames), FP_BLOCK):
+        spectrum = np.fft.rfft(frames[start:start + FP_BLOCK] * window, axis=1)[:, lo:hi]
+        power = spectrum.real ** 2 + spectrum.imag ** 2
+        energies[start:start + FP_BLOCK] = np.add.reduceat(power, edges[:-1] - lo, axis=1)
+    band_diff = energies[:, :-1] - energies[:, 1:]
+    values = band_diff[1:] - band_diff[:-1]
+    fingerprints = np.packbits(values > 0, axis=1, bitorder="little").view("<u4").ravel().astype(np.uint32)
+    if not weak_bits:
+        return fingerprints
+    weakest = np.argpartition(np.abs(values), weak_bits - 1, axis=1)[:, :weak_bits]
+    return fingerprints, np.left_shift(np.uint32(1), weakest.astype(np.uint32))
+
+def _informative(fingerprints):
+    """全零或全一的子指紋來自靜音或削波，不參與投票"""
+    return np.flatnonzero((fingerprints != 0) & (fingerprints != 0xFFFFFFFF))
+
+def _matched_runs(query, stored, offset, min_frames):
+    """按 offset (query 幀 = stored 幀 + offset) 逐幀比較，返回滑動窗口誤碼率低於 FP_MAX_BER 的 (開始, 結束) 幀區間"""
+    lo = max(0, offset)
+    hi = min(len(query), len(stored) + offset)
+    if hi - lo < max(FP_WINDOW, min_frames):
+        return []
+    diff = query[lo:hi] ^ stored[lo - offset:hi - offset]
+    errors = np.unpackbits(diff.view(np.uint8)).reshape(-1, 32).sum(axis=1)
+    cumulative = np.concatenate(([0], np.cumsum(errors)))
+    good = (cumulative[FP_WINDOW:] - cumulative[:-FP_WINDOW]) < FP_MAX_BER * 32 * FP_WINDOW
+    # 連續的合格窗口 [a, b) 覆蓋幀 [a, b - 1 + FP_WINDOW)
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], good.view(np.int8), [0]))))
+    runs = []
+    for a, b in zip(edges[0::2].tolist(), edges[1::2].tolist()):
+        end = b - 1 + FP_WINDOW
+        if end - a >= min_frames:
+            runs.append((lo + a, lo + end))
+    return runs
+
+def _settings_digest(settings):
+    return hashlib.sha1(json.dumps(settings, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+class SegmentCache(DiskCache):
+    """已轉錄音頻的指紋索引，用於在新音頻中找出相同的片段 (片頭、廣告、片尾) 並沿用其單字。
+
+    每個條目是一個 .npz 文件，保存一個音頻的子指紋、轉錄單字 (WordTimeline 二進位格式) 與時長，
+    文件名以轉錄設定的摘要開頭，只與相同設定的條目匹配。記憶體中的索引把所有條目的子指紋接成一條陣列，
+    並按子指紋排序以二分查找；目錄內容改變 (其他進程寫入或淘汰) 時增量更新。
+    總大小超過 max_bytes 時刪除最久未使用的條目。
+    """
+    SUFFIX = ".npz"
+    TIMELINE_CACHE = 8
+    
+    def __init__(self, cache_dir=DEFAULT_SEGMENT_CACHE_DIR, max_bytes=DEFAULT_SEGMENT_CACHE_SIZE):
+        super().__init__(cache_dir, max_bytes)
+        self._lock = threading.Lock()
+        self._timelines = OrderedDict()
+        self._reset()
+    
+    def _reset(self):
+        self._names = []
+        self._bounds = np.zeros(1, dtype=np.int64)
+        self._all = np.empty(0, dtype=np.uint32)
+        self._sorted = np.empty(0, dtype=np.uint32)
+        self._order = np.empty(0, dtype=np.int64)
+    
+    def _entry_name(self, audio_path, settings):
+        return f"{_settings_digest(settings)}_{file_key(audio_path)}{self.SUFFIX}"
+    
+    def _read(self, name, field):
+        try:
+            with np.load(os.path.join(self.cache_dir, name)) as data:
+                return data[field]
+        except (OSError, ValueError, KeyError):
+            return None
+    
+    def _append(self, names, parts):
+        """把新條目的子指紋加入索引：排序新的子指紋後插入已排序的陣列，不重新排序整個索引"""
+        base = len(self._all)
+        new = np.concatenate(parts)
+        positions = _informative(new)
+        order = positions[np.argsort(new[positions], kind="stable")]
+        hashes = new[order]
+        at = np.searchsorted(self._sorted, hashes, side="right")
+        self._sorted = np.insert(self._sorted, at, hashes)
+        self._order = np.insert(self._order, at, order + base)
+        self._all = np.concatenate([self._all, new])
+        lengths = np.array([len(part) for part in parts], dtype=np.int64)
+        self._bounds = np.concatenate([self._bounds, base + np.cumsum(lengths)])
+        self._names.extend(names)
+    
+    def _refresh(self):
+        """與目錄內容同步，調用時必須持有 self._lock"""
+        try:
+            names = {name for name in os.listdir(self.cache_dir) if name.endswith(self.SUFFIX)}
+        except OSError:
+            names = set()
+        known = set(self._names)
+        if names == known:
+            return
+        kept_names, kept_parts = [], []
+        if known - names:
+            # 有條目被淘汰時重建索引，沿用記憶體中仍存在的條目的子指紋
+            for number, name in enumerate(self._names):
+                if name in names:
+                    kept_names.append(name)
+                    kept_parts.append(self._all[self._bounds[number]:self._bounds[number + 1]])
+            self._reset()
+        for name in sorted(names - known):
+            fingerprints = self._read(name, "fingerprints")
+            if fingerprints is not None:
+                kept_names.append(name)
+                kept_parts.append(fingerprints.astype(np.uint32))
+        if kept_names:
+            self._append(kept_names, kept_parts)
+    
+    def match(self, fingerprints, settings, flips=None):
+        """在索引中查找與 fingerprints 相同的音頻，返回不重疊的匹配列表 (按開始位置排序)。
+
+        每個匹配為 (條目名, 開始幀, 結束幀, 偏移幀)：本音頻的 [開始, 結束) 幀與條目中 [開始 - 偏移, 結束 - 偏移) 幀相同。
+        flips 為 audio_fingerprint 返回的翻轉遮罩時，同時以翻轉後的子指紋投票。
+        """
+        prefix = _settings_digest(settings) + "_"
+        min_frames = int(FP_MIN_MATCH_SECONDS * PCM_SAMPLE_RATE / FP_HOP)
+        with self._lock:
+            self._refresh()
+            query = _informative(fingerprints)
+            if not len(self._sorted) or not len(query):
+                return []
+            hashes = fingerprints[query]
+            if flips is not None and flips.shape[1]:
+                hashes = np.concatenate([hashes, (hashes[:, None] ^ flips[query]).ravel()])
+                query = np.concatenate([query, np.repeat(query, flips.shape[1])])
+            lo = np.searchsorted(self._sorted, hashes, side="left")
+            counts = np.searchsorted(self._sorted, hashes, side="right") - lo
+            # 出現次數過多的子指紋 (例如持續的單音) 沒有區分度
+            keep = (counts > 0) & (counts <= FP_MAX_POSTINGS)
+            query, lo, counts = query[keep], lo[keep], counts[keep]
+            if not len(query):
+                return []
+            # 展開每個子指紋的所有命中位置，按 (條目, 偏移) 計票
+            owner = np.repeat(np.arange(len(query)), counts)
+            hits = self._order[np.arange(len(owner)) - np.repeat(np.cumsum(counts) - counts, counts) + lo[owner]]
+            entries = np.searchsorted(self._bounds, hits, side="right") - 1
+            allowed = np.array([name.startswith(prefix) for name in self._names])
+            mask = allowed[entries]
+            offsets = query[owner[mask]] - (hits[mask] - self._bounds[entries[mask]])
+            keys = (entries[mask] << 32) | (offsets + (1 << 31))
+            candidates, votes = np.unique(keys, return_counts=True)
+            best = np.argsort(votes, kind="stable")[::-1]
+            best = best[votes[best] >= FP_MIN_VOTES][:FP_MAX_CANDIDATES]
+            
+            runs = []
+            for key in candidates[best].tolist():
+                entry, offset = key >> 32, (key & 0xFFFFFFFF) - (1 << 31)
+                stored = self._all[self._bounds[entry]:self._bounds[entry + 1]]
+                for start, end in _matched_runs(fingerprints, stored, offset, min_frames):
+                    runs.append((end - start, start, end, offset, self._names[entry]))
+        
+        # 從最長的區間開始選取，與已選區間重疊的捨棄 (相鄰偏移的候選通常覆蓋同一段音頻)
+        covered = np.zeros(len(fingerprints), dtype=bool)
+        matches = []
+        for _, start, end, offset, name in sorted(runs, key=lambda run: -run[0]):
+            if covered[start:end].any():
+                continue
+            covered[start:end] = True
+            matches.append((name, start, end, offset))
+        matches.sort(key=lambda match: match[1])
+        return matches
+    
+    def timeline(self, name):
+        """條目的單字時間軸，最近使用的幾個保留在記憶體中；條目已被刪除時返回 None"""
+        with self._lock:
+            timeline = self._timelines.get(name)
+            if timeline is not None:
+                self._timelines.move_to_end(name)
+                return timeline
+        words = self._read(name, "words")
+        if words is None:
+            return None
+        timeline = WordTimeline.from_bytes(words.tobytes())
+        try:
+            os.utime(os.path.join(self.cache_dir, name))
+        except OSError:
+            pass
+        with self._lock:
+            self._timelines[name] = timeline
+            while len(self._timelines) > self.TIMELINE_CACHE:
+                self._timelines.popitem(last=False)
+        return timeline
+    
+    def reuse(self, match):
+        """把一個匹配換算為本音頻的 (開始秒, 結束秒, 段落列表)；條目已不存在或區間過短時返回 None。
+
+        區間兩端各縮進 FP_MARGIN_SECONDS 秒，跨越邊界的單字不沿用，邊界移到該單字之外，由推理重新轉錄。
+        """
+        name, start, end, offset = match
+        timeline = self.timeline(name)
+        if timeline is None:
+            return None
+        shift = offset * FP_HOP / PCM_SAMPLE_RATE
+        source_start = (start - offset) * FP_HOP / PCM_SAMPLE_RATE + FP_MARGIN_SECONDS
+        source_end = ((end - offset) * FP_HOP + FP_FRAME) / PCM_SAMPLE_RATE - FP_MARGIN_SECONDS
+        nearby = timeline.sorted_by_start().slice_time(source_start, source_end, overlap=True)
+        before = nearby.starts < source_start
+        after = nearby.ends > source_end
+        if before.any():
+            source_start = max(source_start, float(nearby.ends[before].max()))
+        if after.any():
+            source_end = min(source_end, float(nearby.starts[after].min()))
+        if source_end - source_start < FP_MIN_MATCH_SECONDS - 2 * FP_MARGIN_SECONDS:
+            return None
+        inside = nearby.take(~(before | after)).shift(shift)
+        segments = []
+        for _, group in itertools.groupby(zip(inside, inside.segment_ids.tolist()), key=lambda item: item[1]):
+            words = [word for word, _ in group]
+            segments.append({
+                "start": words[0]["start"],
+                "end": words[-1]["end"],
+                "text": " ".join(word.get("original_word", word["word"]) for word in words),
+                "words": words
+            })
+        return round(source_start + shift, 3), round(source_end + shift, 3), segments
+    
+    def put(self, audio_path, settings, fingerprints, words, duration):
+        name = self._entry_name(audio_path, settings)
+        path = os.path.join(self.cache_dir, name)
+        words = np.frombuffer(WordTimeline.coerce(words).to_bytes(), dtype=np.uint8)
+        temp_path = temp_path_for(path)
+        with open(temp_path, 'wb') as f:
+            np.savez(f, fingerprints=fingerprints, words=words, duration=duration)
+        os.replace(temp_path, path)
+        with self._lock:
+            self._timelines.pop(name, None)
+        self.evict()
+
+# 進程內共用的片段快取，指紋索引只載入一次
+_segment_cache = None
+_segment_cache_lock = threading.Lock()
+
+def shared_segment_cache():
+    global _segment_cache
+    with _segment_cache_lock:
+        if _segment_cache is None:
+            _segment_cache = SegmentCache()
+        return _segment_cache
+
+# 分段並行轉錄：在靜音處切分長音頻，多個進程各自持有一個模型
+_pool_transcriber = None
+# 工作進程載入模型的用時，記入該進程處理的第一個任務
+_pool_load_seconds = 0.0
+
+def _init_pool_worker(config, cache_dir=None, cache_size=DEFAULT_CACHE_SIZE):
+    global _pool_transcriber, _pool_load_seconds
+    cache = TranscriptionCache(cache_dir, cache_size) if cache_dir else None
+    start_time = time.perf_counter()
+    _pool_transcriber = AudioTranscriber.from_config(config, cache)
+    _pool_load_seconds = time.perf_counter() - start_time
+
+def plan_chunks(audio, chunk_length=600.0, overlap=5.0, min_silence_len=500, silence_margin=16):
+    """在最接近每 chunk_length 秒的靜音中點切分，返回 (開始, 結束, 保留開始, 保留結束) 秒數列表。
+
+    每段在兩側各多取 overlap 秒音頻，合併時只保留落在 [保留開始, 保留結束) 內的單字。
+    """
+    duration = len(audio) / 1000.0
+    if duration <= chunk_length:
+        return [(0.0, duration, 0.0, duration)]
+    
+    silences = detect_silence(
+        audio,
+        min_silence_len=min_silence_len,
+        silence_thresh=audio.dBFS - silence_margin,
+        seek_step=10
+    )
+    candidates = [(start + end) / 2000.0 for start, end in silences]
+    
+    cuts = [0.0]
+    window = chunk_length / 4
+    while duration - cuts[-1] > chunk_length + window:
+        target = cuts[-1] + chunk_length
+        lo = bisect.bisect_left(candidates, target - window)
+        hi = bisect.bisect_right(candidates, target + window)
+        if lo < hi:
+            cut = min(candidates[lo:hi], key=lambda c: abs(c - target))
+        else:
+            # 找不到靜音時直接切分，重疊區負責補回邊界上的單字
+            cut = target
+        cuts.append(cut)
+    cuts.append(duration)
+    
+    return [
+        (max(0.0, keep_start - overlap), min(duration, keep_end + overlap), keep_start, keep_end)
+        for keep_start, keep_end in zip(cuts, cuts[1:])
+    ]
+
+def _transcribe_chunk(chunk_path, offset, keep_start, keep_end):
+    segments, info = _pool_transcriber.stream_transcription(chunk_path)
+    segments = list(segments)
+    # 只保留中點落在本段範圍內的段落文本，以及開始時間落在範圍內的單字
+    texts = [
+        segment["text"].strip() for segment in segments
+        if keep_start <= offset + (segment["start"] + segment["end"]) / 2 < keep_end
+    ]
+    _, timeline = collect_segments(segments)
+    timeline = timeline.shift(offset).slice_time(keep_start, keep_end)
+    return texts, timeline, len(segments), info.language
+
+def transcribe_chunked(audio_path, executor, chunk_length=600.0, overlap=5.0):
+    """將音頻切分後交給進程池並行轉錄，合併為與 transcribe_audio 相同格式的結果 (不含修正)"""
+    audio = AudioSegment.from_file(audio_path).set_channels(1).set_frame_rate(16000)
+    chunks = plan_chunks(audio, chunk_length, overlap)
+    print(f"音頻切分為 {len(chunks)} 段並行轉錄...")
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        futures = []
+        for k, (start, end, keep_start, keep_end) in enumerate(chunks):
+            chunk_path = os.path.join(temp_dir, f"chunk_{k:04d}.wav")
+            audio[int(start * 1000):int(end * 1000)].export(chunk_path, format="wav")
+            futures.append(executor.submit(_transcribe_chunk, chunk_path, start, keep_start, keep_end))
+        chunk_results = [future.result() for future in futures]
+    
+    transcription = []
+    timelines = []
+    segment_offset = 0
+    for texts, timeline, segment_count, _ in chunk_results:
+        transcription.extend(text for text in texts if text)
+        timeline.segment_ids += segment_offset
+        segment_offset += segment_count
+        timelines.append(timeline)
+    # 切分點兩側重複識別出的同一單字只保留一次
+    word_timestamps = WordTimeline.concatenate(timelines).drop_overlapping_duplicates()
+    
+    return {
+        "transcription": " ".join(transcription),
+        "words": word_timestamps,
+        "duration": round(len(audio) / 1000.0, 3),
+        # 各分段獨立檢測語言，取第一段的結果
+        "language": chunk_results[0][3] if chunk_results else None
+    }
+
+class JobCancelled(Exception):
+    """任務在執行過程中被取消"""
+
+class TranscriptionQueue:
+    """界面使用的轉錄任務隊列：等待中的任務按列表順序交給最多 concurrency 個工作線程執行。
+
+    等待中的任務可以調整順序或直接取消；執行中的任務在下一次進度回調時拋出 JobCancelled 中止。
+    run_job(job, progress) 執行任務並返回結果，on_update(job) 在任務狀態或進度改變時於工作線程中調用。
+    """
+    def __init__(self, run_job, on_update=None, concurrency=1):
+        self.run_job = run_job
+        self.on_update = on_update
+        self.concurrency = max(1, concurrency)
+        self.jobs = OrderedDict()
+        self.pending = []
+        self.workers = 0
+        self.condition = threading.Condition()
+    
+    def submit(self, audio_path, reference_text=None, config=None):
+        job_id = uuid.uuid4().hex
+        job = {
+            "id": job_id,
+            "status": "queued",
+            "audio_path": audio_path,
+            "reference_text": reference_text,
+            "config": config,
+            "progress": 0.0,
+            "submitted": time.time(),
+            "started": None,
+            "finished": None,
+            "result": None,
+            "error": None,
+            "cancel": threading.Event()
+        }
+        with self.condition:
+            self.jobs[job_id] = job
+            self.pending.append(job_id)
+            self._start_workers()
+        self._notify(job)
+        return job_id
+    
+    def _start_workers(self):
+        # 調用時必須持有 self.condition；空閒的工作線程會自行退出，這裡按需補足
+        while self.workers < min(self.concurrency, len(self.pending)):
+            self.workers += 1
+            threading.Thread(target=self._worker_loop, daemon=True).start()
+    
+    def _notify(self, job):
+        if self.on_update is not None:
+            self.on_update(job)
+    
+    def _worker_loop(self):
+        while True:
+            with self.condition:
+                if not self.pending or self.workers > self.concurrency:
+                    self.workers -= 1
+                    return
+                job = self.jobs[self.pending.pop(0)]
+                job["status"] = "running"
+                job["started"] = time.time()
+                # 已開始的任務按開始順序排在等待中的任務之前
+                self.jobs.move_to_end(job["id"])
+            self._notify(job)
+            
+            def progress(fraction, job=job):
+                if job["cancel"].is_set():
+                    raise JobCancelled()
+                job["progress"] = fraction
+                self._notify(job)
+            
+            try:
+                result = self.run_job(job, progress)
+            except JobCancelled:
+                status, result, error = "cancelled", None, None
+            except Exception as e:
+                status, result, error = "failed", None, str(e)
+            else:
+                status, error = "done", None
+            with self.condition:
+                job["status"] = status
+                job["result"] = result
+                job["error"] = error
+                job["finished"] = time.time()
+                if status == "done":
+                    job["progress"] = 1.0
+            self._notify(job)
+    
+    def cancel(self, job_id):
+        """取消等待中或執行中的任務，任務已結束時返回 False"""
+        with self.condition:
+            job = self.jobs.get(job_id)
+            if job is None or job["finished"] is not None:
+                return False
+            job["cancel"].set()
+            if job_id in self.pending:
+                self.pending.remove(job_id)
+                self.jobs.move_to_end(job_id)
+                job["status"] = "cancelled"
+                job["finished"] = time.time()
+            else:
+                job["status"] = "cancelling"
+        self._notify(job)
+        return True
+    
+    def move(self, job_id, offset):
+        """把等待中的任務在隊列中前移 (offset < 0) 或後移，返回是否移動"""
+        with self.condition:
+            if job_id not in self.pending:
+                return False
+            index = self.pending.index(job_id)
+            target = max(0, min(len(self.pending) - 1, index + offset))
+            if target == index:
+                return False
+            self.pending.insert(target, self.pending.pop(index))
+        return True
+    
+    def set_concurrency(self, concurrency):
+        """調整工作線程數；減少時多餘的線程在完成當前任務後退出"""
+        with self.condition:
+            self.concurrency = max(1, concurrency)
+            self._start_workers()
+    
+    def remove_finished(self):
+        with self.condition:
+            for job_id in [job_id for job_id, job in self.jobs.items() if job["finished"] is not None]:
+                del self.jobs[job_id]
+    
+    def get(self, job_id):
+        with self.condition:
+            return self.jobs.get(job_id)
+    
+    def ordered_jobs(self):
+        """按顯示順序返回任務：已開始的任務按開始順序，其後是等待中的任務按隊列順序"""
+        with self.condition:
+            pending = set(self.pending)
+            started = [job for job_id, job in self.jobs.items() if job_id not in pending]
+            return started + [self.jobs[job_id] for job_id in self.pending]
+    
+    def active_count(self):
+        with self.condition:
+            return sum(1 for job in self.jobs.values() if job["finished"] is None)
+
+# 結果文本框每次插入的字符數
+RENDER_CHUNK_CHARS = 20000
+# 隊列面板中各任務狀態的顯示文字
+JOB_STATUS_LABELS = {
+    "queued": "等待中",
+    "running": "轉錄中",
+    "cancelling": "正在取消",
+    "done": "完成",
+    "failed": "失敗",
+    "cancelled": "已取消"
+}
+
+class TranscriberApp:
+    def __init__(self, root, config=None):
+        self.root = root
+        self.config = dict(config or DEFAULT_CONFIG)
+        self.root.title("語音轉錄工具")
+        self.root.geometry("900x700")
+        self.root.configure(bg="#f0f0f0")
+        
+        # 自定義字體
+        self.title_font = tkFont.Font(family="微軟正黑體", size=16, weight="bold")
+        self.normal_font = tkFont.Font(family="微軟正黑體", size=10)
+        self.button_font = tkFont.Font(family="微軟正黑體", size=10, weight="bold")
+        
+        # 創建主框架
+        self.main_frame = ttk.Frame(root, padding=10)
+        self.main_frame.pack(fill=tk.BOTH, expand=True)
+        
+        # 創建樣式
+        self.style = ttk.Style()
+        self.style.configure("TFrame", background="#f0f0f0")
+        self.style.configure("TLabel", background="#f0f0f0", font=self.normal_font)
+        self.style.configure("TButton", font=self.button_font)
+        self.style.configure("Title.TLabel", font=self.title_font)
+        
+        # 創建標題
+        self.title_label = ttk.Label(
+            self.main_frame, 
+            text="語音轉錄工具", 
+            style="Title.TLabel"
+        )
+        self.title_label.grid(row=0, column=0, columnspan=3, pady=10)
+        
+        # 音頻文件選擇與轉錄隊列部分
+        self.audio_frame = ttk.LabelFrame(
+            self.main_frame,
+            text="音頻文件與轉錄隊列 (支援 MP3、WAV、M4A、FLAC 等格式，可多選)",
+            padding=10
+        )
+        self.audio_frame.grid(row=1, column=0, columnspan=3, sticky="nsew", pady=5, padx=5)
+        self.audio_frame.columnconfigure(0, weight=1)
+        self.audio_frame.rowconfigure(1, weight=1)
+        self.main_frame.rowconfigure(1, weight=1)
+        
+        self.audio_path_var = tk.StringVar()
+        # 對話框選擇的文件保存在列表中，輸入框只用於顯示 (路徑本身可以包含分號)
+        self.selected_audio_paths = []
+        self.audio_path_entry = ttk.Entry(self.audio_frame, textvariable=self.audio_path_var, width=50)
+        self.audio_path_entry.grid(row=0, column=0, padx=5, pady=5, sticky="ew")
+        
+        self.browse_button = ttk.Button(
+            self.audio_frame,
+            text="瀏覽...",
+            command=self.browse_audio_file
+        )
+        self.browse_button.grid(row=0, column=1, padx=5, pady=5)
+        
+        self.queue_tree = ttk.Treeview(
+            self.audio_frame,
+            columns=("file", "status", "progress", "elapsed", "eta"),
+            show="headings",
+            height=5,
+            selectmode="browse"
+        )
+        for column, heading, width in (("file", "文件", 360), ("status", "狀態", 80), ("progress", "進度", 60),
+                                       ("elapsed", "已用時間", 80), ("eta", "預計剩餘", 80)):
+            self.queue_tree.heading(column, text=heading)
+            self.queue_tree.column(column, width=width, stretch=column == "file")
+        self.queue_tree.grid(row=1, column=0, columnspan=2, sticky="nsew", padx=5)
+        self.queue_tree.bind("<<TreeviewSelect>>", self.on_job_selected)
+        queue_scrollbar = ttk.Scrollbar(self.audio_frame, orient=tk.VERTICAL, command=self.queue_tree.yview)
+        queue_scrollbar.grid(row=1, column=2, sticky="ns")
+        self.queue_tree.configure(yscrollcommand=queue_scrollbar.set)
+        
+        queue_buttons = ttk.Frame(self.audio_frame)
+        queue_buttons.grid(row=2, column=0, columnspan=2, sticky="w", pady=(5, 0))
+        for text, command in (("上移", lambda: self.move_selected_job(-1)),
+                              ("下移", lambda: self.move_selected_job(1)),
+                              ("取消任務", self.cancel_selected_job),
+                              ("清除已結束", self.clear_finished_jobs)):
+            ttk.Button(queue_buttons, text=text, command=command).pack(side=tk.LEFT, padx=5)
+        
+        # 模型設定部分
+        self.settings_frame = ttk.LabelFrame(self.main_frame, text="模型設定", padding=10)
+        self.settings_frame.grid(row=2, column=0, columnspan=3, sticky="ew", pady=5, padx=5)
+        
+        self.model_var = tk.StringVar(value=self.config["model"])
+        self.compute_type_var = tk.StringVar(value=self.config["compute_type"])
+        self.cpu_threads_var = tk.IntVar(value=self.config["cpu_threads"])
+        self.beam_size_var = tk.IntVar(value=self.config["beam_size"])
+        self.vad_filter_var = tk.BooleanVar(value=self.config["vad_filter"])
+        
+        ttk.Label(self.settings_frame, text="模型:").grid(row=0, column=0, padx=5, sticky="w")
+        ttk.Combobox(
+            self.settings_frame, 
+            textvariable=self.model_var, 
+            values=MODEL_CHOICES, 
+            width=14
+        ).grid(row=0, column=1, padx=5)
+        ttk.Label(self.settings_frame, text="計算類型:").grid(row=0, column=2, padx=5, sticky="w")
+        ttk.Combobox(
+            self.settings_frame, 
+            textvariable=self.compute_type_var, 
+            values=COMPUTE_TYPE_CHOICES, 
+            width=12, 
+            state="readonly"
+        ).grid(row=0, column=3, padx=5)
+        ttk.Label(self.settings_frame, text="線程數 (0=自動):").grid(row=0, column=4, padx=5, sticky="w")
+        ttk.Spinbox(
+            self.settings_frame, 
+            textvariable=self.cpu_threads_var, 
+            from_=0, 
+            to=os.cpu_count() or 64, 
+            width=4
+        ).grid(row=0, column=5, padx=5)
+        ttk.Label(self.settings_frame, text="束寬:").grid(row=0, column=6, padx=5, sticky="w")
+        ttk.Spinbox(
+            self.settings_frame, 
+            textvariable=self.beam_size_var, 
+            from_=1, 
+            to=10, 
+            width=3
+        ).grid(row=0, column=7, padx=5)
+        ttk.Checkbutton(
+            self.settings_frame, 
+            text="VAD 過濾", 
+            variable=self.vad_filter_var
+        ).grid(row=0, column=8, padx=5)
+        
+        ttk.Label(self.settings_frame, text="導出格式:").grid(row=1, column=0, padx=5, pady=(5, 0), sticky="w")
+        self.export_format_vars = {}
+        formats_frame = ttk.Frame(self.settings_frame)
+        formats_frame.grid(row=1, column=1, columnspan=6, sticky="w", pady=(5, 0))
+        for fmt in EXPORTERS:
+            var = tk.BooleanVar(value=fmt in self.config["export_formats"])
+            self.export_format_vars[fmt] = var
+            ttk.Checkbutton(formats_frame, text=fmt.upper(), variable=var).pack(side=tk.LEFT, padx=5)
+        self.subtitle_by_segment_var = tk.BooleanVar(value=self.config["subtitle_by_segment"])
+        ttk.Checkbutton(
+            self.settings_frame, 
+            text="字幕按段落分組", 
+            variable=self.subtitle_by_segment_var
+        ).grid(row=1, column=7, columnspan=2, padx=5, pady=(5, 0), sticky="w")
+        
+        # 並行任務數只決定隊列的工作線程數，不寫入模型的 num_workers：
+        # 後者是模型登記表鍵的一部分，改變它會另外載入一份相同的模型
+        self.parallel_jobs_var = tk.IntVar(value=self.config["parallel_jobs"])
+        ttk.Label(self.settings_frame, text="並行任務數:").grid(row=2, column=0, padx=5, pady=(5, 0), sticky="w")
+        ttk.Spinbox(
+            self.settings_frame,
+            textvariable=self.parallel_jobs_var,
+            from_=1,
+            to=8,
+            width=3,
+            command=self.apply_concurrency
+        ).grid(row=2, column=1, padx=5, pady=(5, 0), sticky="w")
+        self.timing_weight_var = tk.StringVar(value=self.config["timing_weight"])
+        ttk.Label(self.settings_frame, text="時間分配:").grid(row=2, column=2, padx=5, pady=(5, 0), sticky="w")
+        ttk.Combobox(
+            self.settings_frame,
+            textvariable=self.timing_weight_var,
+            values=TIMING_WEIGHT_CHOICES,
+            width=12,
+            state="readonly"
+        ).grid(row=2, column=3, padx=5, pady=(5, 0), sticky="w")
+        self.segment_cache_var = tk.BooleanVar(value=self.config["segment_cache"])
+        ttk.Checkbutton(
+            self.settings_frame,
+            text="沿用重複片段",
+            variable=self.segment_cache_var
+        ).grid(row=2, column=4, columnspan=2, padx=5, pady=(5, 0), sticky="w")
+        
+        # 參考文本框架
+        self.ref_frame = ttk.LabelFrame(
+            self.main_frame, 
+            text="參考文本 (可選) - 可直接貼上純文字或上傳TXT文件", 
+            padding=10
+        )
+        self.ref_frame.grid(row=3, column=0, columnspan=3, sticky="nsew", pady=5, padx=5)
+        self.main_frame.columnconfigure(0, weight=1)
+        self.main_frame.rowconfigure(3, weight=1)
+        
+        self.ref_text = scrolledtext.ScrolledText(
+            self.ref_frame, 
+            wrap=tk.WORD, 
+            width=80, 
+            height=6, 
+            font=self.normal_font
+        )
+        self.ref_text.grid(row=0, column=0, columnspan=2, sticky="nsew", padx=5, pady=5)
+        self.ref_frame.columnconfigure(0, weight=1)
+        self.ref_frame.rowconfigure(0, weight=1)
+
+        self.browse_ref_button = ttk.Button(
+            self.ref_frame, 
+            text="從文件導入...", 
+            command=self.browse_ref_file
+        )
+        self.browse_ref_button.grid(row=1, column=0, sticky="w", padx=5, pady=5)
+        
+        self.clear_ref_button = ttk.Button(
+            self.ref_frame, 
+            text="清除參考文本", 
+            command=self.clear_ref_text
+        )
+        self.clear_ref_button.grid(row=1, column=1, sticky="e", padx=5, pady=5)
+        
+        self.action_frame = ttk.Frame(self.main_frame, padding=5)
+        self.action_frame.grid(row=4, column=0, columnspan=3, sticky="ew", pady=5, padx=5)
+        
+        self.transcribe_button = ttk.Button(
+            self.action_frame, 
+            text="開始轉錄", 
+            command=self.start_transcription
+        )
+        self.transcribe_button.grid(row=0, column=0, padx=5, pady=5)
+        
+        self.status_var = tk.StringVar(value="準備就緒")
+        self.status_label = ttk.Label(self.action_frame, textvariable=self.status_var)
+        self.status_label.grid(row=0, column=1, padx=5, pady=5)
+        
+        self.progress_var = tk.DoubleVar()
+        self.progress_bar = ttk.Progressbar(
+            self.action_frame, 
+            orient=tk.HORIZONTAL, 
+            length=300, 
+            mode="determinate", 
+            maximum=100,
+            variable=self.progress_var
+        )
+        self.progress_bar.grid(row=0, column=2, padx=5, pady=5, sticky="ew")
+        self.action_frame.columnconfigure(2, weight=1)
+
+        self.result_frame = ttk.LabelFrame(self.main_frame, text="轉錄結果", padding=10)
+        self.result_frame.grid(row=5, column=0, columnspan=3, sticky="nsew", pady=5, padx=5)
+        self.main_frame.rowconfigure(5, weight=2)
+        
+        self.result_text = scrolledtext.ScrolledText(
+            self.result_frame, 
+            wrap=tk.WORD, 
+            width=80, 
+            height=18, 
+            font=self.normal_font
+        )
+        self.result_text.grid(row=0, column=0, sticky="nsew", padx=5, pady=5)
+        self.result_frame.columnconfigure(0, weight=1)
+        self.result_frame.rowconfigure(0, weight=1)
+        
+        self.help_frame = ttk.LabelFrame(self.main_frame, text="使用說明", padding=5)
+        self.help_frame.grid(row=6, column=0, columnspan=3, sticky="ew", pady=5, padx=5)
+        
+        help_text = """1. 選擇一個或多個音頻文件 (MP3、WAV、M4A、FLAC 等 ffmpeg 可解碼的格式)。
+2. 可選：輸入參考文本或從文件導入，參考文本套用於同一次加入的所有文件。
+3. 點擊"開始轉錄"把文件加入隊列，轉錄期間可以繼續加入文件、調整等待中任務的順序或取消任務。
+4. 處理完成後，結果將顯示在下方的文本框中 (在隊列中選擇任務可查看其結果)，並按所選的導出格式 (TXT、JSON、SRT、WebVTT 等) 自動保存。
+5. 可在"模型設定"中選擇模型大小、計算類型、線程數與並行任務數，int8 在 CPU 上通常更快。"""
+
+        self.help_label = ttk.Label(self.help_frame, text=help_text, justify=tk.LEFT)
+        self.help_label.grid(row=0, column=0, sticky="w", padx=5, pady=5)
+
+        self.cache = TranscriptionCache()
+        self.queue = TranscriptionQueue(self.run_job, self.on_job_update, self.config["parallel_jobs"])
+        self._render_job = 0
+        self._refresh_scheduled = False
+        self._tick_scheduled = False
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+    
+    def browse_audio_file(self):
+        patterns = " ".join(f"*{ext}" for ext in AUDIO_EXTENSIONS)
+        filepaths = filedialog.askopenfilenames(
+            title="選擇音頻文件",
+            filetypes=[("音頻文件", patterns), ("所有文件", "*.*")]
+        )
+        if filepaths:
+            self.selected_audio_paths = list(filepaths)
+            self.audio_path_var.set("; ".join(filepaths))
+    
+    def browse_ref_file(self):
+        filepath = filedialog.askopenfilename(
+            title="選擇參考文本文件",
+            filetypes=[("文本文件", "*.txt")]
+        )
+        if filepath:
+            try:
+                with open(filepath, 'r', encoding='utf-8') as f:
+                    content = f.read()
+                self.ref_text.delete(1.0, tk.END)
+                self.ref_text.insert(tk.END, content)
+            except Exception as e:
+                messagebox.showerror("錯誤", f"無法讀取文件: {e}")
+                
+    def clear_ref_text(self):
+        """清除參考文本"""
+        self.ref_text.delete(1.0, tk.END)
+    
+    def start_transcription(self):
+        """把所選文件加入轉錄隊列"""
+        text = self.audio_path_var.get()
+        if self.selected_audio_paths and text == "; ".join(self.selected_audio_paths):
+            audio_paths = list(self.selected_audio_paths)
+        else:
+            # 輸入框被手動修改時視為單個路徑
+            audio_paths = [text.strip()] if text.strip() else []
+        
+        if not audio_paths:
+            messagebox.showerror("錯誤", "請選擇音頻文件")
+            return
+        
+        missing = [path for path in audio_paths if not os.path.exists(path)]
+        if missing:
+            messagebox.showerror("錯誤", "找不到音頻文件:\n" + "\n".join(missing))
+            return
+        
+        reference_text = self.ref_text.get(1.0, tk.END).strip()
+        if not reference_text:
+            reference_text = None
+        else:
+            print(f"使用參考文本，長度: {len(reference_text)} 字符")
+        
+        try:
+            config = self.read_settings()
+        except (tk.TclError, ValueError) as e:
+            messagebox.showerror("錯誤", f"模型設定無效: {e}")
+            return
+
+        self.queue.set_concurrency(config["parallel_jobs"])
+        for audio_path in audio_paths:
+            self.queue.submit(audio_path, reference_text, config)
+        self.selected_audio_paths = []
+        self.audio_path_var.set("")
+
+    def apply_concurrency(self):
+        """並行任務數改變時立即調整隊列的工作線程數"""
+        try:
+            self.queue.set_concurrency(self.parallel_jobs_var.get())
+        except tk.TclError:
+            pass
+
+    def selected_job_id(self):
+        selection = self.queue_tree.selection()
+        return selection[0] if selection else None
+    
+    def move_selected_job(self, offset):
+        job_id = self.selected_job_id()
+        if job_id is not None and self.queue.move(job_id, offset):
+            self.schedule_refresh()
+    
+    def cancel_selected_job(self):
+        job_id = self.selected_job_id()
+        if job_id is not None:
+            self.queue.cancel(job_id)
+    
+    def clear_finished_jobs(self):
+        self.queue.remove_finished()
+        self.schedule_refresh()
+    
+    def on_close(self):
+        if self.queue.active_count() and not messagebox.askokcancel("退出", "仍有未完成的轉錄任務，確定要退出嗎?"):
+            return
+        self.root.destroy()
+    
+    def read_settings(self):
+        """讀取界面上的模型設定，並保存到設定文件供下次使用"""
+        config = dict(
+            self.config,
+            model=self.model_var.get().strip(),
+            compute_type=self.compute_type_var.get(),
+            cpu_threads=self.cpu_threads_var.get(),
+            beam_size=self.beam_size_var.get(),
+            vad_filter=self.vad_filter_var.get(),
+            parallel_jobs=max(1, self.parallel_jobs_var.get()),
+            export_formats=[fmt for fmt, var in self.export_format_vars.items() if var.get()],
+            subtitle_by_segment=self.subtitle_by_segment_var.get(),
+            timing_weight=self.timing_weight_var.get(),
+            segment_cache=self.segment_cache_var.get()
+        )
+        if not config["model"]:
+            raise ValueError("請選擇模型")
+        if not config["export_formats"]:
+            raise ValueError("請至少選擇一種導出格式")
+        if config != self.config:
+            self.config = config
+            save_config(config)
+        return config
+        
+    def run_job(self, job, progress):
+        """在隊列的工作線程中轉錄並保存一個任務；相同設定的任務共用登記表中已載入的模型"""
+        config = job["config"]
+        metrics = JobMetrics(job["audio_path"], config)
+        with metrics.stage("model_load"):
+            transcriber = AudioTranscriber.from_config(config, self.cache)
+        try:
+            result = transcriber.transcribe_audio(job["audio_path"], job["reference_text"], progress,
+                                                  metrics=metrics)
+        finally:
+            transcriber.close()
+        if "error" in result:
+            raise RuntimeError(result["error"])
+        # 寫文件同樣在工作線程中完成，不阻塞界面
+        with metrics.stage("output"):
+            output_files = save_results(result, job["audio_path"], config)
+        return {"result": result, "output_files": output_files, "metrics": metrics.record()}
+
+    def on_job_update(self, job):
+        """由工作線程調用，把界面更新交給事件循環"""
+        if job["finished"] is not None and job["status"] in ("done", "failed"):
+            self.root.after(0, self.show_job, job["id"])
+        self.root.after(0, self.schedule_refresh)
+
+    def schedule_refresh(self):
+        # 進度回調可能很頻繁，合併為每輪事件循環最多刷新一次
+        if not self._refresh_scheduled:
+            self._refresh_scheduled = True
+            self.root.after_idle(self.refresh_queue_view)
+    
+    def refresh_queue_view(self):
+        """按隊列當前狀態更新任務列表、總進度與狀態欄"""
+        self._refresh_scheduled = False
+        now = time.time()
+        jobs = self.queue.ordered_jobs()
+        present = set()
+        counts = {}
+        progress_total = 0.0
+        for index, job in enumerate(jobs):
+            present.add(job["id"])
+            counts[job["status"]] = counts.get(job["status"], 0) + 1
+            fraction = job["progress"]
+            elapsed = eta = ""
+            if job["started"] is not None:
+                seconds = (job["finished"] or now) - job["started"]
+                elapsed = f"{seconds:.0f} 秒"
+                if job["finished"] is None and 0 < fraction < 1:
+                    eta = f"{seconds * (1 - fraction) / fraction:.0f} 秒"
+            values = (job["audio_path"], JOB_STATUS_LABELS[job["status"]], f"{fraction * 100:.0f}%", elapsed, eta)
+            if self.queue_tree.exists(job["id"]):
+                self.queue_tree.item(job["id"], values=values)
+            else:
+                self.queue_tree.insert("", tk.END, iid=job["id"], values=values)
+            self.queue_tree.move(job["id"], "", index)
+            if job["status"] != "cancelled":
+                progress_total += 1.0 if job["finished"] is not None else fraction
+        for job_id in self.queue_tree.get_children():
+            if job_id not in present:
+                self.queue_tree.delete(job_id)
+        
+        counted = len(jobs) - counts.get("cancelled", 0)
+        self.progress_var.set(progress_total / counted * 100 if counted else 0)
+        running = counts.get("running", 0) + counts.get("cancelling", 0)
+        if jobs:
+            self.status_var.set(f"轉錄中 {running} 個，等待 {counts.get('queued', 0)} 個，"
+                                f"完成 {counts.get('done', 0)} 個，失敗 {counts.get('failed', 0)} 個")
+        else:
+            self.status_var.set("準備就緒")
+        
+        # 有任務在執行時每秒刷新一次已用時間與預計剩餘時間
+        if running and not self._tick_scheduled:
+            self._tick_scheduled = True
+            self.root.after(1000, self.tick)
+    
+    def tick(self):
+        self._tick_scheduled = False
+        self.refresh_queue_view()
+    
+    def on_job_selected(self, event=None):
+        job_id = self.selected_job_id()
+        if job_id is not None:
+            self.show_job(job_id)
+    
+    def show_job(self, job_id):
+        """在結果文本框中顯示已結束任務的結果或錯誤"""
+        job = self.queue.get(job_id)
+        if job is None or job["finished"] is None:
+            return
+        if job["status"] == "done":
+            elapsed_time = job["finished"] - job["started"]
+            self.display_results(job["result"]["result"], job["result"]["output_files"], elapsed_time,
+                                 job["result"]["metrics"])
+        elif job["status"] == "failed":
+            self.show_error(f"轉錄過程中發生錯誤: {job['error']}")
+    
+    def display_results(self, result, output_files, elapsed_time, metrics=None):
+        """顯示轉錄結果"""
+        if "corrected_transcription" in result:
+            parts = [
+                "== 修正後的轉錄 ==\n\n",
+                result["corrected_transcription"],
+                "\n\n== 原始轉錄 ==\n\n",
+                result["original_transcription"]
+            ]
+        else:
+            parts = ["== 轉錄 ==\n\n", result["transcription"]]
+        if output_files is not None:
+            parts.append("\n\n結果已保存至:\n" + "\n".join(output_files))
+        parts.append(f"\n\n用時 {elapsed_time:.2f} 秒")
+        if metrics is not None:
+            stages = "，".join(f"{name} {seconds:.2f} 秒" for name, seconds in metrics["stages"].items())
+            parts.append(f"\n各階段: {stages}\n峰值記憶體 {metrics['peak_rss_mb']:.0f} MB")
+            if "real_time_factor" in metrics:
+                parts.append(f"，實時因子 {metrics['real_time_factor']:.3f}")
+            if "cached_fraction" in metrics:
+                parts.append(f"，片段快取 {metrics['cached_fraction']:.1%}")
+        
+        self.result_text.delete(1.0, tk.END)
+        self._render_job += 1
+        self.render_text(self._render_job, "".join(parts), 0)
+    
+    def render_text(self, job, text, position):
+        """分批插入長文本，每批之間把控制權交回事件循環，避免界面卡住"""
+        if job != self._render_job:
+            # 已開始新的轉錄，放棄舊結果的剩餘部分
+            return
+        end = position + RENDER_CHUNK_CHARS
+        self.result_text.insert(tk.END, text[position:end])
+        if end < len(text):
+            self.root.after(1, self.render_text, job, text, end)
+        
+    def show_error(self, error_msg):
+        """顯示錯誤信息"""
+        self._render_job += 1
+        self.result_text.delete(1.0, tk.END)
+        self.result_text.insert(tk.END, error_msg)
+        self.result_text.insert(tk.END, "\n\n請確保已安裝所有必要的 Python 包:\n")
+        self.result_text.insert(tk.END, "pip install faster-whisper pydub numpy tkinter")
+
+class TranscriptionService:
+    """本地轉錄服務的任務隊列：有界隊列加固定數量的工作線程，工作線程共用已載入的模型"""
+    def __init__(self, config, workers=2, queue_size=16, cache=None, max_finished=1000):
+        # 讓 CTranslate2 允許與工作線程數相同的並行轉錄
+        self.config = dict(config, num_workers=max(config["num_workers"], workers))
+        self.cache = cache
+        self.max_finished = max_finished
+        self.upload_dir = tempfile.mkdtemp(prefix="AudioChronoText_")
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.jobs = OrderedDict()
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.load_error = None
+        self.latencies = deque(maxlen=1000)
+        self.real_time_factors = deque(maxlen=1000)
+        self.workers = [threading.Thread(target=self._worker_loop, daemon=True) for _ in range(workers)]
+        for worker in self.workers:
+            worker.start()
+    
+    def submit(self, audio_path=None, audio_bytes=None, filename="upload.mp3", reference_text=None):
+        """加入一個任務並返回任務 ID；隊列已滿時拋出 queue.Full"""
+        job_id = uuid.uuid4().hex
+        uploaded = audio_bytes is not None
+        if uploaded:
+            extension = os.path.splitext(filename)[1] or ".mp3"
+            audio_path = os.path.join(self.upload_dir, job_id + extension)
+            with open(audio_path, 'wb') as f:
+                f.write(audio_bytes)
+        
+        job = {
+            "id": job_id,
+            "status": "queued",
+            "audio_path": audio_path,
+            "reference_text": reference_text,
+            "uploaded": uploaded,
+            "submitted": time.time(),
+            "started": None,
+            "finished": None,
+            "result": None,
+            "error": None,
+            "metrics": None
+        }
+        with self.lock:
+            self.jobs[job_id] = job
+        try:
+            self.queue.put_nowait(job)
+        except queue.Full:
+            with self.lock:
+                del self.jobs[job_id]
+                self.rejected += 1
+            if uploaded:
+                os.remove(audio_path)
+            raise
+        return job_id
+    
+    def _worker_loop(self):
+        try:
+            transcriber = AudioTranscriber.from_config(self.config, self.cache)
+        except Exception as e:
+            # 模型無法載入時工作線程不退出，繼續取出任務並標記為失敗，任務不會永遠停留在 queued
+            transcriber = None
+            with self.lock:
+                self.load_error = f"模型載入失敗: {e}"
+            print(self.load_error)
+        while True:
+            job = self.queue.get()
+            with self.lock:
+                job["status"] = "running"
+                job["started"] = time.time()
+                self.in_flight += 1
+            metrics = JobMetrics(job["audio_path"], self.config)
+            try:
+                if transcriber is None:
+                    raise RuntimeError(self.load_error)
+                result = transcriber.transcribe_audio(job["audio_path"], job["reference_text"], metrics=metrics)
+                error = result.get("error")
+            except Exception as e:
+                result, error = None, str(e)
+            finally:
+                if job["uploaded"] and os.path.exists(job["audio_path"]):
+                    os.remove(job["audio_path"])
+            
+            with self.lock:
+                job["finished"] = time.time()
+                job["metrics"] = metrics.record()
+                self.in_flight -= 1
+                if error:
+                    job["status"] = "failed"
+                    job["error"] = error
+                    self.failed += 1
+                else:
+                    job["status"] = "done"
+                    job["result"] = result
+                    self.completed += 1
+                    self.latencies.append(job["finished"] - job["submitted"])
+                    if result.get("duration"):
+                        self.real_time_factors.append((job["finished"] - job["started"]) / result["duration"])
+                self._forget_old_jobs()
+            self.queue.task_done()
+    
+    def _forget_old_jobs(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job["finished"] is not None]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self.jobs[job_id]
+    
+    def job_status(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            status = {key: job[key] for key in ("id", "status", "submitted", "started", "finished", "error",
+                                                "metrics")}
+        if status["finished"] is not None:
+            status["latency"] = round(status["finished"] - status["submitted"], 3)
+        return status
+    
+    def job_result(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return None if job is None else (job["status"], job["result"])
+    
+    def metrics(self):
+        def summary(values):
+            if not values:
+                return None
+            ordered = sorted(values)
+            return {
+                "mean": round(sum(ordered) / len(ordered), 3),
+                "p50": round(ordered[len(ordered) // 2], 3),
+                "p95": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3),
+                "max": round(ordered[-1], 3)
+            }
+        
+        with self.lock:
+            metrics = {
+                "queue_depth": self.queue.qsize(),
+                "queue_capacity": self.queue.maxsize,
+                "in_flight": self.in_flight,
+                "workers": len(self.workers),
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "load_error": self.load_error,
+                "latency_seconds": summary(self.latencies),
+                "real_time_factor": summary(self.real_time_factors)
+            }
+        metrics["models"] = MODEL_REGISTRY.stats()
+        if self.cache is not None:
+            metrics["cache"] = self.cache.stats()
+        return metrics
+
+def _json_default(value):
+    if isinstance(value, WordTimeline):
+        return value.to_dicts()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+class TranscriptionRequestHandler(BaseHTTPRequestHandler):
+    """POST /jobs 提交任務，GET /jobs/<id> 查詢狀態，GET /jobs/<id>/result 取得結果，GET /metrics 查看指標"""
+    service = None
+    
+    def _send_json(self, status, data, headers=None):
+        body = json.dumps(data, ensure_ascii=False, default=_json_default).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != "/jobs":
+            self._send_json(404, {"error": "not found"})
+            return
+        
+        params = parse_qs(url.query)
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            if length < 0:
+                raise ValueError("Content-Length 不能為負數")
+            body = self.rfile.read(length)
+            if self.headers.get("Content-Type", "").startswith("application/json"):
+                # JSON: {"audio_path": ...} 或 {"audio_base64": ..., "filename": ...}，可附帶 reference_text
+                request = json.loads(body)
+                if not isinstance(request, dict):
+                    raise ValueError("請求體必須是 JSON 對象")
+                audio_bytes = None
+                if "audio_base64" in request:
+                    audio_bytes = base64.b64decode(request["audio_base64"])
+                elif not isinstance(request.get("audio_path"), str) or not os.path.isfile(request["audio_path"]):
+                    raise ValueError(f"找不到文件: {request.get('audio_path')}")
+                kwargs = {
+                    "audio_path": request.get("audio_path"),
+                    "audio_bytes": audio_bytes,
+                    "filename": request.get("filename", "upload.mp3"),
+                    "reference_text": request.get("reference_text") or None
+                }
+            else:
+                # 其他類型的請求體視為音頻數據，參考文本通過查詢參數 reference 傳遞
+                if not body:
+                    raise ValueError("請求體為空")
+                kwargs = {
+                    "audio_bytes": body,
+                    "filename": params.get("filename", ["upload.mp3"])[0],
+                    "reference_text": params.get("reference", [None])[0]
+                }
+        except (ValueError, TypeError) as e:
+            self._send_json(400, {"error": str(e)})
+            return
+        
+        try:
+            job_id = self.service.submit(**kwargs)
+        except queue.Full:
+            self._send_json(503, {"error": "隊列已滿，請稍後重試"}, {"Retry-After": "5"})
+            return
+        self._send_json(202, {"job_id": job_id, "status": "queued"}, {"Location": f"/jobs/{job_id}"})
+    
+    def do_GET(self):
+        parts = [part for part in urlparse(self.path).path.split("/") if part]
+        if parts == ["metrics"]:
+            self._send_json(200, self.service.metrics())
+        elif len(parts) == 2 and parts[0] == "jobs":
+            status = self.service.job_status(parts[1])
+            if status is None:
+                self._send_json(404, {"error": "找不到任務"})
+            else:
+                self._send_json(200, status)
+        elif len(parts) == 3 and parts[0] == "jobs" and parts[2] == "result":
+            found = self.service.job_result(parts[1])
+            if found is None:
+                self._send_json(404, {"error": "找不到任務"})
+            elif found[0] != "done":
+                self._send_json(409, {"error": f"任務尚未完成: {found[0]}"})
+            else:
+                self._send_json(200, found[1])
+        else:
+            self._send_json(404, {"error": "not found"})
+    
+    def log_message(self, format, *args):
+        pass
+
+def run_server(config, host="127.0.0.1", port=8765, workers=2, queue_size=16, cache=None):
+    service = TranscriptionService(config, workers, queue_size, cache)
+    handler = type("Handler", (TranscriptionRequestHandler,), {"service": service})
+    server = ThreadingHTTPServer((host, port), handler)
+    print(f"轉錄服務運行於 http://{host}:{port}，工作線程 {workers} 個，隊列容量 {queue_size}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        shutil.rmtree(service.upload_dir, ignore_errors=True)
+
+AUDIO_EXTENSIONS = (".mp3", ".wav", ".m4a", ".flac", ".ogg", ".opus", ".aac", ".wma", ".aiff",
+                    ".mp4", ".webm", ".mkv", ".mov")
+
+def collect_audio_files(inputs):
+    """展開目錄與通配符，返回去重且排序後的音頻文件列表"""
+    files = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for dirpath, _, filenames in os.walk(item):
+                for name in filenames:
+                    if name.lower().endswith(AUDIO_EXTENSIONS):
+                        files.append(os.path.join(dirpath, name))
+        elif glob.has_magic(item):
+            files.extend(p for p in glob.glob(item, recursive=True)
+                         if os.path.isfile(p) and p.lower().endswith(AUDIO_EXTENSIONS))
+        elif os.path.isfile(item):
+            files.append(item)
+        else:
+            print(f"找不到文件: {item}")
+    return sorted(set(os.path.abspath(p) for p in files))
+
+def _read_reference(audio_path, reference_ext):
+    if reference_ext:
+        ref_path = os.path.splitext(audio_path)[0] + reference_ext
+        if os.path.isfile(ref_path):
+            with open(ref_path, 'r', encoding='utf-8') as f:
+                return f.read().strip() or None
+    return None
+
+def _take_pool_load_seconds(metrics):
+    global _pool_load_seconds
+    if _pool_load_seconds:
+        metrics.add_stage("model_load", _pool_load_seconds)
+        _pool_load_seconds = 0.0
+
+def _batch_transcribe_file(audio_path, reference_ext=None, config=None, pcm_path=None, profile=None):
+    reference_text = _read_reference(audio_path, reference_ext)
+    start_time = time.time()
+    metrics = JobMetrics(audio_path, config)
+    _take_pool_load_seconds(metrics)
+    try:
+        with profiled(profile, os.path.splitext(audio_path)[0] + "_transcription"):
+            audio = load_pcm(pcm_path) if pcm_path else None
+            summary = stream_transcribe_to_files(_pool_transcriber, audio_path, reference_text, config,
+                                                 audio, metrics)
+    except Exception as e:
+        return {"audio_path": audio_path, "error": str(e), "elapsed": time.time() - start_time,
+                "metrics": dict(metrics.record(), error=str(e))}
+    
+    return {
+        "audio_path": audio_path,
+        "duration": summary["duration"],
+        "words": summary["words"],
+        "cache_hit": summary["cache_hit"],
+        "cached_fraction": summary.get("cached_fraction"),
+        "elapsed": time.time() - start_time,
+        "metrics": metrics.record()
+    }
+
+def _batch_transcribe_chunked(audio_path, executor, config, cache, reference_ext, chunk_length, overlap,
+                              profile=None):
+    reference_text = _read_reference(audio_path, reference_ext)
+    start_time = time.time()
+    # 分段模式的解碼、切分與推理分佈在多個進程中，合併記為 inference
+    metrics = JobMetrics(audio_path, config)
+    try:
+        with profiled(profile, os.path.splitext(audio_path)[0] + "_transcription"):
+            settings = cache_settings(config, chunk_length=chunk_length, overlap=overlap)
+            with metrics.stage("cache_lookup"):
+                cache_key, raw = lookup_cache(cache, audio_path, settings)
+            cache_hit = raw is not None
+            if raw is None:
+                with metrics.stage("inference"):
+                    raw = transcribe_chunked(audio_path, executor, chunk_length, overlap)
+                if cache_key is not None:
+                    with metrics.stage("cache_write"):
+                        cache.put(cache_key, raw["transcription"], raw["words"], raw["duration"],
+                                  raw["language"])
+            result = build_result(raw["transcription"], raw["words"], reference_text, metrics,
+                                  config["timing_weight"], language=raw.get("language"))
+            with metrics.stage("output"):
+                save_results(result, audio_path, config)
+    except Exception as e:
+        return {"audio_path": audio_path, "error": str(e), "elapsed": time.time() - start_time,
+                "metrics": dict(metrics.record(), error=str(e))}
+    
+    metrics.set(duration=raw["duration"], asr_words=len(raw["words"]), words=len(result["words"]),
+                cache_hit=cache_hit)
+    return {
+        "audio_path": audio_path,
+        "duration": raw["duration"],
+        "words": len(result["words"]),
+        "cache_hit": cache_hit,
+        "elapsed": time.time() - start_time,
+        "metrics": metrics.record()
+    }
+
+def _batch_transcribe_prefetched(audio_paths, executor, workers, reference_ext, config,
+                                 prefetch, prefetch_bytes, pcm_dir, profile=None):
+    """主進程在背景線程中提前解碼後續文件，工作進程以記憶體映射讀取 PCM；按完成順序產生結果"""
+    temp_dir = None if pcm_dir else tempfile.mkdtemp(prefix="AudioChronoText_pcm_")
+    prefetcher = AudioPrefetcher(audio_paths, pcm_dir or temp_dir, workers + prefetch, prefetch_bytes,
+                                 keep=pcm_dir is not None)
+    completed = queue.Queue()
+    
+    def on_done(future, decoded):
+        prefetcher.release(decoded)
+        completed.put((future, decoded))
+    
+    def submit_all():
+        try:
+            for decoded in prefetcher:
+                if "error" in decoded:
+                    prefetcher.release(decoded)
+                    completed.put((None, decoded))
+                    continue
+                future = executor.submit(_batch_transcribe_file, decoded["audio_path"], reference_ext,
+                                         config, decoded["pcm_path"], profile)
+                future.add_done_callback(lambda f, decoded=decoded: on_done(f, decoded))
+        except Exception as e:
+            completed.put((None, {"error": str(e)}))
+    
+    submitter = threading.Thread(target=submit_all, daemon=True)
+    submitter.start()
+    inference_seconds = 0.0
+    try:
+        for _ in audio_paths:
+            future, decoded = completed.get()
+            if future is None:
+                if "audio_path" not in decoded:
+                    raise RuntimeError(f"預解碼出錯: {decoded['error']}")
+                yield {"audio_path": decoded["audio_path"], "error": f"解碼失敗: {decoded['error']}",
+                       "elapsed": decoded["decode_seconds"]}
+                continue
+            item = future.result()
+            item["decode_seconds"] = decoded["decode_seconds"]
+            # 解碼在主進程中完成，補記到任務的指標中
+            item["metrics"]["stages"]["decode"] = round(decoded["decode_seconds"], 3)
+            inference_seconds += item["elapsed"]
+            yield item
+        submitter.join()
+        stats = prefetcher.stats()
+        print(f"解碼 {stats['files']} 個文件用時 {stats['decode_seconds']:.1f} 秒 (與推理重疊)，"
+              f"推理與寫出用時 {inference_seconds:.1f} 秒，等待解碼 {stats['wait_seconds']:.1f} 秒，"
+              f"預解碼數據峰值 {stats['peak_mb']:.0f} MB")
+    finally:
+        if temp_dir is not None:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+def run_batch(inputs, workers=1, config=None, reference_ext=None, force=False,
+              chunked=False, chunk_length=600.0, overlap=5.0,
+              cache_dir=DEFAULT_CACHE_DIR, cache_size=DEFAULT_CACHE_SIZE,
+              prefetch=2, prefetch_bytes=DEFAULT_PREFETCH_BYTES, pcm_dir=None,
+              metrics_path=None, profile=None):
+    """無界面批次轉錄：多個工作進程各自持有一個模型，已有最新輸出的文件會被跳過。
+
+    chunked 為 True 時逐個處理文件，每個文件在靜音處切分後由全部工作進程並行轉錄。
+    否則 prefetch 大於 0 時，主進程提前解碼之後的 prefetch 個文件 (總量不超過 prefetch_bytes)，
+    使解碼不佔用推理時間；pcm_dir 指定時解碼結果保留在該目錄供之後重用。
+    metrics_path 指定時每個任務的指標記錄追加為一行 JSON；profile 為 PROFILERS 之一時
+    在每個輸出旁寫出分析結果。
+    """
+    files = collect_audio_files(inputs)
+    config = config or dict(DEFAULT_CONFIG)
+    if force:
+        pending = files
+    else:
+        pending = [p for p in files if not outputs_up_to_date(p, config["export_formats"])]
+    skipped = len(files) - len(pending)
+    print(f"共 {len(files)} 個文件，跳過 {skipped} 個已完成的文件，待處理 {len(pending)} 個")
+    if not pending:
+        return []
+    
+    if not chunked:
+        workers = min(workers, len(pending))
+    workers = max(1, workers)
+    results = []
+    start_time = time.time()
+    metrics_file = open(metrics_path, 'a', encoding='utf-8') if metrics_path else None
+    # 分段模式的工作進程只轉錄切分後的分段，不使用片段快取 (與 transcribe_audio_chunked 相同)
+    worker_config = dict(config, segment_cache=False) if chunked else config
+    with ProcessPoolExecutor(max_workers=workers,
+                             initializer=_init_pool_worker,
+                             initargs=(worker_config, cache_dir, cache_size)) as executor:
+        if chunked:
+            cache = TranscriptionCache(cache_dir, cache_size) if cache_dir else None
+            items = (_batch_transcribe_chunked(p, executor, config, cache, reference_ext, chunk_length, overlap,
+                                               profile)
+                     for p in pending)
+        elif prefetch > 0:
+            items = _batch_transcribe_prefetched(pending, executor, workers, reference_ext, config,
+                                                 prefetch, prefetch_bytes, pcm_dir, profile)
+        else:
+            futures = [executor.submit(_batch_transcribe_file, p, reference_ext, config, None, profile)
+                       for p in pending]
+            items = (future.result() for future in as_completed(futures))
+        for done, item in enumerate(items, 1):
+            results.append(item)
+            if metrics_file is not None and "metrics" in item:
+                metrics_file.write(json.dumps(item["metrics"], ensure_ascii=False) + "\n")
+                metrics_file.flush()
+            if "error" in item:
+                print(f"[{done}/{len(pending)}] 失敗 {item['audio_path']}: {item['error']}")
+            else:
+                print(f"[{done}/{len(pending)}] 完成 {item['audio_path']} "
+                      f"({item['duration']:.1f} 秒音頻，用時 {item['elapsed']:.1f} 秒)")
+    wall_time = time.time() - start_time
+    if metrics_file is not None:
+        metrics_file.close()
+    
+    succeeded = [r for r in results if "error" not in r]
+    audio_seconds = sum(r["duration"] for r in succeeded)
+    compute_seconds = sum(r["elapsed"] for r in succeeded)
+    print(f"完成 {len(succeeded)} 個，失敗 {len(results) - len(succeeded)} 個，總用時 {wall_time:.1f} 秒")
+    cache_hits = sum(1 for r in succeeded if r.get("cache_hit"))
+    if cache_hits:
+        print(f"快取命中 {cache_hits} 個，未命中 {len(succeeded) - cache_hits} 個")
+    fingerprinted = [r for r in succeeded if r.get("cached_fraction") is not None]
+    if fingerprinted:
+        seconds = sum(r["cached_fraction"] * r["duration"] for r in fingerprinted)
+        total = sum(r["duration"] for r in fingerprinted)
+        print(f"片段快取沿用 {seconds:.1f} 秒音頻，佔推理文件的 {seconds / total if total else 0.0:.1%}")
+    if wall_time > 0:
+        print(f"吞吐量: {len(succeeded) / wall_time * 3600:.1f} 文件/小時")
+    if audio_seconds > 0:
+        # 實時因子 = 處理時間 / 音頻時長，越小越快
+        print(f"實時因子 (牆鐘): {wall_time / audio_seconds:.3f}，"
+              f"實時因子 (單進程): {compute_seconds / audio_seconds:.3f}")
+    stage_totals = {}
+    for r in succeeded:
+        for name, seconds in r.get("metrics", {}).get("stages", {}).items():
+            stage_totals[name] = stage_totals.get(name, 0.0) + seconds
+    if stage_totals:
+        print("各階段總用時: " + "，".join(f"{name} {seconds:.1f} 秒" for name, seconds in stage_totals.items()))
+    return results
+
+def make_synthetic_pair(num_words, substitution_rate=0.05, insertion_rate=0.02, deletion_rate=0.02, seed=0):
+    """生成合成的 (轉錄單字, 參考單字) 對，參考文本按給定比例替換、插入、刪除單字"""
+    rng = random.Random(seed)
+    # 按 Zipf 分佈抽取詞彙，使常用詞大量重複，接近真實文本
+    vocabulary = [f"w{k}" for k in range(5000)]
+    weights = [1.0 / (k + 1) for k in range(len(vocabulary))]
+    trans_words = rng.choices(vocabulary, weights, k=num_words)
+    ref_words = []
+    for word in trans_words:
+        roll = rng.random()
+        if roll < deletion_rate:
+            continue
+        if roll < deletion_rate + substitution_rate:
+            ref_words.append(rng.choice(vocabulary))
+        else:
+            ref_words.append(word)
+        if rng.random() < insertion_rate:
+            ref_words.append(rng.choice(vocabulary))
+    return trans_words, ref_words
+
+def benchmark_alignment(sizes=(1000, 5000, 20000, 40000), difflib_limit=20000, seed=0):
+    """比較 align_words 與 difflib.SequenceMatcher 在不同長度輸入上的耗時與匹配單字數"""
+    rows = []
+    print(f"{'單字數':>8} {'align_words(秒)':>16} {'匹配數':>8} {'difflib(秒)':>12} {'匹配數':>8}")
+    for size in sizes:
+        trans_words, ref_words = make_synthetic_pair(size, seed=seed)
+        
+        start_time = time.perf_counter()
+        opcodes = align_words(trans_words, ref_words)
+        align_time = time.perf_counter() - start_time
+        align_matched = sum(i2 - i1 for tag, i1, i2, _, _ in opcodes if tag == 'equal')
+        
+        row = {"words": size, "align_seconds": align_time, "align_matched": align_matched}
+        if size <= difflib_limit:
+            start_time = time.perf_counter()
+            opcodes = difflib.SequenceMatcher(None, trans_words, ref_words).get_opcodes()
+            row["difflib_seconds"] = time.perf_counter() - start_time
+            row["difflib_matched"] = sum(i2 - i1 for tag, i1, i2, _, _ in opcodes if tag == 'equal')
+            print(f"{size:>8} {align_time:>16.3f} {align_matched:>8} "
+                  f"{row['difflib_seconds']:>12.3f} {row['difflib_matched']:>8}")
+        else:
+            print(f"{size:>8} {align_time:>16.3f} {align_matched:>8} {'-':>12} {'-':>8}")
+        rows.append(row)
+    return rows
+
+def make_synthetic_timeline(words, seed=0, words_per_segment=20):
+    """為單字列表生成隨機但可重現的時間戳，每 words_per_segment 個單字為一段"""
+    rng = random.Random(seed)
+    starts, ends, segments = [], [], []
+    t = 0.0
+    for i in range(len(words)):
+        duration = rng.uniform(0.1, 0.6)
+        starts.append(round(t, 3))
+        ends.append(round(t + duration, 3))
+        segments.append(i // words_per_segment)
+        t += duration + rng.uniform(0.0, 0.2)
+    return WordTimeline(words, starts, ends, segments=segments)
+
+def benchmark_exports(num_words, formats, seed=0):
+    """在合成時間軸上測量每種導出格式單獨寫出的時間與文件大小，以及一次寫出全部格式的時間"""
+    words, _ = make_synthetic_pair(num_words, seed=seed)
+    timeline = make_synthetic_timeline(words, seed)
+    text = " ".join(words)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        audio_path = os.path.join(tmp, "bench.mp3")
+        print(f"{'格式':<10}{'大小 (KB)':>14}{'寫入時間 (秒)':>16}{'單字/秒':>14}")
+        for fmt in formats:
+            config = dict(DEFAULT_CONFIG, export_formats=[fmt])
+            start_time = time.perf_counter()
+            path, = export_results(audio_path, "== 轉錄 ==", [text], timeline, config)
+            elapsed = time.perf_counter() - start_time
+            size = os.path.getsize(path)
+            print(f"{fmt:<10}{size / 1024:>14.1f}{elapsed:>16.3f}{num_words / elapsed:>14.0f}")
+        
+        config = dict(DEFAULT_CONFIG, export_formats=list(formats))
+        start_time = time.perf_counter()
+        export_results(audio_path, "== 轉錄 ==", [text], timeline, config)
+        elapsed = time.perf_counter() - start_time
+        print(f"一次寫出全部 {len(formats)} 種格式: {elapsed:.3f} 秒")
+
+def word_agreement(words_a, words_b):
+    """兩組單字的一致度，即匹配單字數 * 2 / 總單字數"""
+    a = [w.lower() for w in WordTimeline.coerce(words_a).words()]
+    b = [w.lower() for w in WordTimeline.coerce(words_b).words()]
+    if not a and not b:
+        return 1.0
+    matched = sum(i2 - i1 for tag, i1, i2, _, _ in align_words(a, b) if tag == 'equal')
+    return 2.0 * matched / (len(a) + len(b))
+
+def benchmark_configs(sample_path, configs):
+    """以每組設定轉錄同一樣本，報告載入時間、轉錄時間、實時因子及與第一組 (基準) 的單字一致度"""
+    rows = []
+    baseline_words = None
+    print(f"{'模型':>16} {'計算類型':>12} {'線程':>4} {'束寬':>4} {'VAD':>5} "
+          f"{'載入(秒)':>9} {'轉錄(秒)':>9} {'實時因子':>9} {'一致度':>7}")
+    for config in configs:
+        start_time = time.perf_counter()
+        # 每組設定都必須實際推理，不沿用之前轉錄的片段
+        transcriber = AudioTranscriber.from_config(dict(config, segment_cache=False))
+        load_time = time.perf_counter() - start_time
+        
+        start_time = time.perf_counter()
+        result = transcriber.transcribe_audio(sample_path)
+        transcribe_time = time.perf_counter() - start_time
+        transcriber.close()
+        # 立即卸載，避免多個模型同時佔用記憶體
+        MODEL_REGISTRY.unload_idle(0)
+        
+        if baseline_words is None:
+            baseline_words = result["words"]
+        agreement = word_agreement(baseline_words, result["words"])
+        rtf = transcribe_time / result["duration"] if result["duration"] else 0.0
+        rows.append({
+            "config": config,
+            "load_seconds": load_time,
+            "transcribe_seconds": transcribe_time,
+            "real_time_factor": rtf,
+            "agreement": agreement
+        })
+        print(f"{config['model']:>16} {config['compute_type']:>12} {config['cpu_threads']:>4} "
+              f"{config['beam_size']:>4} {str(config['vad_filter']):>5} "
+              f"{load_time:>9.2f} {transcribe_time:>9.2f} {rtf:>9.3f} {agreement:>7.3f}")
+    return rows
+
+def benchmark_batched(clip_paths, config, batch_size=None, memory_budget_mb=None):
+    """以同一組短片段比較逐個 transcribe_audio 與 transcribe_batch 的吞吐量 (片段/秒) 及單字一致度"""
+    # 預先解碼，兩種方式都不計解碼時間；不使用快取
+    audios = [decode_audio(path, sampling_rate=PCM_SAMPLE_RATE) for path in clip_paths]
+    total_seconds = sum(len(audio) for audio in audios) / PCM_SAMPLE_RATE
+    transcriber = AudioTranscriber.from_config(dict(config, segment_cache=False))
+    batch_size = batch_size or adaptive_batch_size(config["model"], config["beam_size"], memory_budget_mb)
+    try:
+        # 先各轉錄一次作為預熱，首次調用的初始化不計入任何一方
+        transcriber.transcribe_audio(clip_paths[0], audio=audios[0])
+        transcriber.transcribe_batch(audios[:1], batch_size=1)
+        
+        start_time = time.perf_counter()
+        sequential = [transcriber.transcribe_audio(path, audio=audio) for path, audio in zip(clip_paths, audios)]
+        sequential_time = time.perf_counter() - start_time
+        
+        start_time = time.perf_counter()
+        batched = transcriber.transcribe_batch(audios, batch_size=batch_size)
+        batched_time = time.perf_counter() - start_time
+    finally:
+        transcriber.close()
+    
+    agreement = sum(word_agreement(a["words"], b["words"]) for a, b in zip(sequential, batched)) / len(audios)
+    print(f"{len(audios)} 個片段，共 {total_seconds:.0f} 秒音頻，批次大小 {batch_size}")
+    print(f"{'方式':<10}{'用時(秒)':>10}{'片段/秒':>10}{'實時因子':>10}")
+    for name, elapsed in (("逐個", sequential_time), ("批次", batched_time)):
+        print(f"{name:<10}{elapsed:>10.2f}{len(audios) / elapsed:>10.2f}{elapsed / total_seconds:>10.3f}")
+    print(f"加速 {sequential_time / batched_time:.2f} 倍，單字一致度 {agreement:.3f}")
+    return {
+        "clips": len(audios),
+        "batch_size": batch_size,
+        "sequential_seconds": sequential_time,
+        "batched_seconds": batched_time,
+        "agreement": agreement
+    }
+
+class SyntheticWhisperModel:
+    """離線基準測試用的替身模型，接口與 WhisperModel.transcribe 相同。
+
+    按音頻長度以固定語速生成可重現的合成段落與單字 (帶標點與大小寫)，不做任何推理，
+    用於測量模型以外的轉錄路徑：逐段清理單字、收集時間軸、修正與導出。
+    """
+    def __init__(self, words_per_second=2.5, segment_seconds=5.0, seed=0):
+        self.words_per_second = words_per_second
+        self.segment_seconds = segment_seconds
+        self.seed = seed
+    
+    def transcribe(self, audio, **options):
+        if not isinstance(audio, np.ndarray):
+            audio = decode_audio(audio, sampling_rate=PCM_SAMPLE_RATE)
+        duration = len(audio) / PCM_SAMPLE_RATE
+        return self._segments(duration), SimpleNamespace(duration=duration, language="en")
+    
+    def _segments(self, duration):
+        rng = random.Random(self.seed)
+        vocabulary = [f"w{k}" for k in range(5000)]
+        weights = [1.0 / (k + 1) for k in range(len(vocabulary))]
+        step = 1.0 / self.words_per_second
+        start = 0.0
+        while start < duration:
+            end = min(duration, start + self.segment_seconds)
+            count = max(1, int((end - start) * self.words_per_second))
+            tokens = _punctuate(rng.choices(vocabulary, weights, k=count), rng)
+            words = [SimpleNamespace(word=" " + token, start=start + k * step, end=start + (k + 0.8) * step)
+                     for k, token in enumerate(tokens)]
+            yield SimpleNamespace(start=start, end=end, text=" " + " ".join(tokens), words=words)
+            start = end
+
+def _punctuate(words, rng):
+    """給合成單字隨機加上句首大寫與標點，使清理與分詞的開銷接近真實文本"""
+    tokens = []
+    capitalize = True
+    for word in words:
+        if capitalize:
+            word = word.capitalize()
+        roll = rng.random()
+        if roll < 0.08:
+            word += "."
+        elif roll < 0.15:
+            word += ","
+        elif roll < 0.17:
+            word = f'"{word}"'
+        capitalize = roll < 0.08
+        tokens.append(word)
+    return tokens
+
+def _edit_middle(text, seed, num_words=30):
+    """模擬編輯一個段落：把文本中間 num_words 個單字換成 num_words * 1.5 個新單字"""
+    words = text.split(" ")
+    rng = random.Random(seed)
+    middle = len(words) // 2
+    replacement = [f"edit{rng.randrange(1000)}" for _ in range(num_words * 3 // 2)]
+    return " ".join(words[:middle] + replacement + words[middle + num_words:])
+
+BENCHMARK_VERSION = 1
+# 基準測試的差異程度：(替換率, 插入率, 刪除率)
+BENCHMARK_PROFILES = {
+    "typical": (0.05, 0.02, 0.02),
+    "divergent": (0.30, 0.10, 0.10)
+}
+
+def _best_time(func, repeat):
+    """運行 repeat 次取最短時間，減少其他進程造成的波動"""
+    best = float("inf")
+    for _ in range(max(1, repeat)):
+        start_time = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start_time)
+    return best
+
+def run_benchmark_suite(sizes=(1000, 5000, 20000), asr_minutes=(10, 60), repeat=3, seed=0):
+    """在固定種子的合成數據上測量對齊、修正、分詞、導出與 (替身模型的) 轉錄路徑，返回 {名稱: 秒數}"""
+    results = {}
+    
+    def measure(name, func):
+        results[name] = _best_time(func, repeat)
+        print(f"{name:<40}{results[name]:>12.4f}")
+    
+    print(f"{'項目':<40}{'用時 (秒)':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            for profile, (substitution, insertion, deletion) in BENCHMARK_PROFILES.items():
+                trans_words, ref_words = make_synthetic_pair(size, substitution, insertion, deletion, seed)
+                timeline = make_synthetic_timeline(trans_words, seed)
+                transcription = " ".join(trans_words)
+                reference_text = " ".join(_punctuate(ref_words, random.Random(seed)))
+                measure(f"align_words/{profile}/{size}", lambda: align_words(trans_words, ref_words))
+                measure(f"correct_transcription/{profile}/{size}",
+                        lambda: correct_transcription(transcription, reference_text, timeline))
+                # 編輯中間一段後增量重新對齊，兩個版本交替使每次都有改動
+                aligner = IncrementalAligner(transcription, timeline, reference_text)
+                versions = itertools.cycle([_edit_middle(reference_text, seed), reference_text])
+                measure(f"realign/{profile}/{size}", lambda: aligner.update(next(versions)))
+            
+            raw_tokens = reference_text.split()
+            # 每次先清空快取，測量的是單次切分整份參考文本的成本
+            measure(f"tokenize_clean/{size}", lambda: (clean_word.cache_clear(), tokenize(reference_text)))
+            measure(f"clean_word/{size}", lambda: (clean_word.cache_clear(), [clean_word(w) for w in raw_tokens]))
+            audio_path = os.path.join(tmp, f"bench_{size}.mp3")
+            for fmt in ("txt", "json"):
+                config = dict(DEFAULT_CONFIG, export_formats=[fmt])
+                measure(f"export_{fmt}/{size}",
+                        lambda: export_results(audio_path, "== 轉錄 ==", [transcription], timeline, config))
+        
+        # 替身模型的轉錄路徑，音頻以零填充的 PCM 傳入，不需要解碼或真實模型
+        audio_path = os.path.join(tmp, "bench_asr.mp3")
+        with open(audio_path, 'wb'):
+            pass
+        transcriber = AudioTranscriber(model=SyntheticWhisperModel(seed=seed))
+        for minutes in asr_minutes:
+            audio = np.zeros(int(minutes * 60 * PCM_SAMPLE_RATE), dtype=np.float32)
+            measure(f"transcribe_stub/{minutes}min", lambda: transcriber.transcribe_audio(audio_path, audio=audio))
+        transcriber.close()
+    return results
+
+def save_benchmark(path, results, params):
+    record = {
+        "version": BENCHMARK_VERSION,
+        "created": time.time(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "params": params,
+        "results": {name: round(seconds, 6) for name, seconds in results.items()}
+    }
+    with open(path + ".tmp", 'w', encoding='utf-8') as f:
+        json.dump(record, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+def compare_benchmarks(results, baseline, threshold=0.2):
+    """與基準記錄比較，返回用時超過基準 (1 + threshold) 倍的 (名稱, 基準, 當前, 比值) 列表"""
+    if baseline.get("version") != BENCHMARK_VERSION:
+        raise ValueError("基準文件的版本不同，請重新生成基準")
+    regressions = []
+    print(f"{'項目':<40}{'基準 (秒)':>12}{'當前 (秒)':>12}{'比值':>8}")
+    for name, seconds in results.items():
+        base = baseline["results"].get(name)
+        if not base:
+            print(f"{name:<40}{'-':>12}{seconds:>12.4f}{'-':>8}")
+            continue
+        ratio = seconds / base
+        flag = " !" if ratio > 1 + threshold else ""
+        print(f"{name:<40}{base:>12.4f}{seconds:>12.4f}{ratio:>8.2f}{flag}")
+        if ratio > 1 + threshold:
+            regressions.append((name, base, seconds, ratio))
+    return regressions
+
+def _config_overrides(args):
+    return {
+        "model": args.model,
+        "device": args.device,
+        "compute_type": args.compute_type,
+        "cpu_threads": args.cpu_threads,
+        "num_workers": args.num_workers,
+        "beam_size": args.beam_size,
+        "vad_filter": args.vad_filter,
+        "export_formats": getattr(args, "formats", None),
+        "subtitle_max_chars": getattr(args, "subtitle_max_chars", None),
+        "subtitle_max_duration": getattr(args, "subtitle_max_duration", None),
+        "subtitle_by_segment": getattr(args, "subtitle_by_segment", None),
+        "timing_weight": args.timing_weight,
+        "segment_cache": args.segment_cache
+    }
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description="語音轉錄工具，不帶參數時啟動圖形界面")
+    parser.add_argument("--config", default=None, help=f"設定文件，預設為 {DEFAULT_CONFIG_PATH}")
+    subparsers = parser.add_subparsers(dest="command")
+    
+    # 模型設定選項，未指定的項目使用設定文件中的值
+    model_options = argparse.ArgumentParser(add_help=False)
+    model_options.add_argument("--config", default=argparse.SUPPRESS, help="設定文件")
+    model_options.add_argument("--model", default=None, help="Whisper 模型名稱")
+    model_options.add_argument("--device", default=None, help="運行設備")
+    model_options.add_argument("--compute-type", default=None, help="計算類型，例如 int8、float32")
+    model_options.add_argument("--cpu-threads", type=int, default=None, help="每個模型使用的 CPU 線程數")
+    model_options.add_argument("--num-workers", type=int, default=None, help="每個模型的並行轉錄數")
+    model_options.add_argument("--beam-size", type=int, default=None, help="束搜索寬度")
+    model_options.add_argument("--vad-filter", action=argparse.BooleanOptionalAction, default=None,
+                               help="轉錄前用 VAD 過濾靜音")
+    model_options.add_argument("--timing-weight", choices=TIMING_WEIGHT_CHOICES, default=None,
+                               help="參考文本修正時替換與插入單字的時間分配方式，chars 按字元數加權")
+    model_options.add_argument("--segment-cache", action=argparse.BooleanOptionalAction, default=None,
+                               help="以音頻指紋找出與已轉錄音頻相同的片段 (片頭、廣告等) 並沿用其單字，只推理其餘部分")
+    
+    # 導出設定選項
+    export_options = argparse.ArgumentParser(add_help=False)
+    export_options.add_argument("--formats", type=lambda value: value.split(","), default=None,
+                                help=f"以逗號分隔的導出格式，可選 {', '.join(EXPORTERS)}")
+    export_options.add_argument("--subtitle-max-chars", type=int, default=None, help="每條字幕的最大字符數")
+    export_options.add_argument("--subtitle-max-duration", type=float, default=None, help="每條字幕的最長時間 (秒)")
+    export_options.add_argument("--subtitle-by-segment", action=argparse.BooleanOptionalAction, default=None,
+                                help="在轉錄段落的邊界處開始新字幕")
+    
+    batch_parser = subparsers.add_parser("batch", parents=[model_options, export_options],
+                                         help="無界面批次轉錄目錄或通配符匹配的音頻文件")
+    batch_parser.add_argument("inputs", nargs="+", help="音頻文件、目錄或通配符")
+    batch_parser.add_argument("-j", "--workers", type=int, default=1, help="工作進程數，每個進程載入一個模型")
+    batch_parser.add_argument("--reference-ext", default=None,
+                              help="與音頻同名的參考文本擴展名，例如 .ref.txt")
+    batch_parser.add_argument("--force", action="store_true", help="忽略已有輸出，重新轉錄所有文件")
+    batch_parser.add_argument("--chunked", action="store_true",
+                              help="逐個處理文件，每個文件在靜音處切分後由所有工作進程並行轉錄")
+    batch_parser.add_argument("--chunk-length", type=float, default=600.0, help="分段長度 (秒)")
+    batch_parser.add_argument("--overlap", type=float, default=5.0, help="分段之間的重疊 (秒)")
+    batch_parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="轉錄快取目錄")
+    batch_parser.add_argument("--cache-size-mb", type=int, default=DEFAULT_CACHE_SIZE // 1024 ** 2,
+                              help="快取大小上限 (MB)")
+    batch_parser.add_argument("--no-cache", action="store_true", help="不使用轉錄快取")
+    batch_parser.add_argument("--prefetch", type=int, default=2,
+                              help="在推理的同時提前解碼的文件數，0 表示由工作進程自行解碼")
+    batch_parser.add_argument("--prefetch-mb", type=int, default=DEFAULT_PREFETCH_BYTES // 1024 ** 2,
+                              help="提前解碼的音頻數據上限 (MB)")
+    batch_parser.add_argument("--pcm-cache", default=None,
+                              help="保留解碼後 PCM 的目錄，之後的運行以記憶體映射直接讀取")
+    batch_parser.add_argument("--metrics", default=None,
+                              help="把每個任務的分階段用時、峰值記憶體與實時因子追加到此 JSON Lines 文件")
+    batch_parser.add_argument("--profile", choices=PROFILERS, default=None,
+                              help="對每個任務運行分析器，結果保存在輸出文件旁 (.prof 或 .profile.html)")
+    
+    cache_parser = subparsers.add_parser("cache", help="顯示或清除轉錄快取與片段快取")
+    cache_parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="轉錄快取目錄")
+    cache_parser.add_argument("--segment-cache-dir", default=DEFAULT_SEGMENT_CACHE_DIR, help="片段快取目錄")
+    cache_parser.add_argument("--clear", action="store_true", help="刪除所有快取條目")
+    
+    align_parser = subparsers.add_parser("bench-align", help="比較對齊引擎與 difflib 在合成文本上的速度")
+    align_parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000, 20000, 40000],
+                              help="每組測試的單字數")
+    align_parser.add_argument("--difflib-limit", type=int, default=20000,
+                              help="超過此單字數時不再運行 difflib")
+    align_parser.add_argument("--seed", type=int, default=0, help="隨機種子")
+    
+    serve_parser = subparsers.add_parser("serve", parents=[model_options], help="啟動本地 HTTP 轉錄服務")
+    serve_parser.add_argument("--host", default="127.0.0.1", help="監聽地址")
+    serve_parser.add_argument("--port", type=int, default=8765, help="監聽端口")
+    serve_parser.add_argument("-j", "--workers", type=int, default=2, help="工作線程數")
+    serve_parser.add_argument("--queue-size", type=int, default=16, help="等待隊列容量，已滿時返回 503")
+    serve_parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="轉錄快取目錄")
+    serve_parser.add_argument("--no-cache", action="store_true", help="不使用轉錄快取")
+    
+    query_parser = subparsers.add_parser("query", help="按時間範圍或單字查詢已保存的轉錄結果")
+    query_parser.add_argument("path", help="_transcription.json 文件或對應的音頻文件")
+    query_parser.add_argument("--range", nargs=2, metavar=("START", "END"), dest="time_range",
+                              help="時間範圍，例如 01:12:30 01:13:00")
+    query_parser.add_argument("--word", default=None, help="要查找的單字或詞組")
+    query_parser.add_argument("--context", type=int, default=3, help="單字查詢時前後顯示的單字數")
+    
+    export_parser = subparsers.add_parser("bench-export", help="比較各導出格式的文件大小與寫入時間")
+    export_parser.add_argument("--words", type=int, default=200000, help="合成單字數")
+    export_parser.add_argument("--formats", type=lambda value: value.split(","), default=list(EXPORTERS),
+                               help="以逗號分隔的導出格式")
+    
+    suite_parser = subparsers.add_parser("bench", help="在合成數據上運行可重現的基準測試並與基準記錄比較")
+    suite_parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000, 20000],
+                              help="對齊、分詞與導出測試的單字數")
+    suite_parser.add_argument("--asr-minutes", type=int, nargs="+", default=[10, 60],
+                              help="替身模型轉錄測試的音頻長度 (分鐘)")
+    suite_parser.add_argument("--repeat", type=int, default=3, help="每項重複次數，取最短時間")
+    suite_parser.add_argument("--seed", type=int, default=0, help="隨機種子")
+    suite_parser.add_argument("--output", default="benchmark.json", help="結果文件 (JSON)")
+    suite_parser.add_argument("--baseline", default=None, help="用於比較的基準結果文件")
+    suite_parser.add_argument("--threshold", type=float, default=0.2,
+                              help="用時超過基準的比例上限，例如 0.2 表示慢 20%% 視為退化")
+    suite_parser.add_argument("--update-baseline", action="store_true", help="把本次結果寫入 --baseline 文件")
+    
+    batched_parser = subparsers.add_parser("bench-batched", parents=[model_options],
+                                           help="比較短片段逐個轉錄與批次推理的吞吐量")
+    batched_parser.add_argument("inputs", nargs="+", help="短音頻文件、目錄或通配符")
+    batched_parser.add_argument("--batch-size", type=int, default=None, help="編碼器批次大小，預設按記憶體預算選擇")
+    batched_parser.add_argument("--memory-mb", type=int, default=None,
+                                help="批次推理的記憶體預算 (MB)，預設為可用記憶體的四分之一")
+    batched_parser.add_argument("--limit", type=int, default=64, help="最多使用的片段數")
+    
+    config_parser = subparsers.add_parser("bench-config", parents=[model_options],
+                                          help="以多組模型設定轉錄樣本，比較速度與單字一致度")
+    config_parser.add_argument("sample", help="樣本音頻文件")
+    config_parser.add_argument("--models", nargs="+", default=None, help="要比較的模型")
+    config_parser.add_argument("--compute-types", nargs="+", default=None, help="要比較的計算類型")
+    config_parser.add_argument("--thread-counts", type=int, nargs="+", default=None, help="要比較的 CPU 線程數")
+    config_parser.add_argument("--beam-sizes", type=int, nargs="+", default=None, help="要比較的束寬")
+    return parser
+
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+    if args.command in ("batch", "serve", "bench-config", "bench-batched"):
+        config = load_config(args.config, _config_overrides(args))
+    else:
+        config = load_config(args.config)
+    
+    if args.command == "batch":
+        if args.profile is not None:
+            try:
+                check_profiler(args.profile)
+            except ValueError as e:
+                print(e)
+                return 2
+        results = run_batch(args.inputs, args.workers, config,
+                            args.reference_ext, args.force,
+                            args.chunked, args.chunk_length, args.overlap,
+                            None if args.no_cache else args.cache_dir, args.cache_size_mb * 1024 ** 2,
+                            args.prefetch, args.prefetch_mb * 1024 ** 2, args.pcm_cache,
+                            args.metrics, args.profile)
+        return 1 if any("error" in r for r in results) else 0
+    if args.command == "cache":
+        cache = TranscriptionCache(args.cache_dir)
+        if args.clear:
+            cache.clear()
+        stats = cache.stats()
+        print(f"快取目錄: {args.cache_dir}")
+        print(f"條目數: {stats['entries']}，大小: {stats['bytes'] / 1024 ** 2:.1f} MB")
+        if os.path.isdir(args.segment_cache_dir):
+            segment_cache = SegmentCache(args.segment_cache_dir)
+            if args.clear:
+                segment_cache.clear()
+            stats = segment_cache.stats()
+            print(f"片段快取目錄: {args.segment_cache_dir}")
+            print(f"條目數: {stats['entries']}，大小: {stats['bytes'] / 1024 ** 2:.1f} MB")
+        return 0
+    if args.command == "bench-align":
+        benchmark_alignment(args.sizes, args.difflib_limit, args.seed)
+        return 0
+    if args.command == "bench-export":
+        benchmark_exports(args.words, args.formats)
+        return 0
+    if args.command == "bench":
+        results = run_benchmark_suite(args.sizes, args.asr_minutes, args.repeat, args.seed)
+        params = {"sizes": args.sizes, "asr_minutes": args.asr_minutes, "repeat": args.repeat, "seed": args.seed}
+        save_benchmark(args.output, results, params)
+        print(f"結果已保存至: {args.output}")
+        if args.baseline is None:
+            return 0
+        if args.update_baseline or not os.path.isfile(args.baseline):
+            save_benchmark(args.baseline, results, params)
+            print(f"基準已更新: {args.baseline}")
+            return 0
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare_benchmarks(results, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} 項比基準慢超過 {args.threshold:.0%}")
+            return 1
+        print("沒有發現性能退化")
+        return 0
+    if args.command == "query":
+        if args.time_range is None and args.word is None:
+            print("請指定 --range 或 --word")
+            return 2
+        run_query(args.path, args.time_range, args.word, args.context)
+        return 0
+    if args.command == "serve":
+        cache = None if args.no_cache else TranscriptionCache(args.cache_dir)
+        run_server(config, args.host, args.port, args.workers, args.queue_size, cache)
+        return 0
+    if args.command == "bench-batched":
+        clip_paths = collect_audio_files(args.inputs)[:args.limit]
+        if not clip_paths:
+            print("沒有找到音頻文件")
+            return 1
+        benchmark_batched(clip_paths, config, args.batch_size, args.memory_mb)
+        return 0
+    if args.command == "bench-config":
+        # 第一組設定 (即當前設定) 作為一致度的基準
+        configs = [config]
+        for model in args.models or [config["model"]]:
+            for compute_type in args.compute_types or [config["compute_type"]]:
+                for threads in args.thread_counts or [config["cpu_threads"]]:
+                    for beam_size in args.beam_sizes or [config["beam_size"]]:
+                        candidate = dict(config, model=model, compute_type=compute_type,
+                                         cpu_threads=threads, beam_size=beam_size)
+                        if candidate not in configs:
+                            configs.append(candidate)
+        benchmark_configs(args.sample, configs)
+        return 0
+    
+    # 在界面啟動的同時於背景載入模型，首次轉錄時無需等待
+    MODEL_REGISTRY.preload(config)
+    root = tk.Tk()
+    app = TranscriberApp(root, config)
+    root.mainloop()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())